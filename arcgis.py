@@ -1,61 +1,110 @@
-from datetime import datetime
 try:
     from processor import Processor
+    from dates import normalise_date
+    from records import CatalogueRecord
 except:
     from .processor import Processor
+    from .dates import normalise_date
+    from .records import CatalogueRecord
 
 
 class ProcessorARCGIS(Processor):
     def __init__(self):
         super().__init__(type="arcgis")
+        self.page_size = 100
 
-    def get_datasets(self, owner, start_url, fname):
-        datasets = []
+    def page_url(self, url, number, size):
+        separator = "&" if "?" in url else "?"
+        return f"{url}{separator}page[number]={number}&page[size]={size}"
 
-        url = start_url
+    def get_datasets(self, owner, start_url, fname):
+        # only a search on a hub can be paged by number, e.g. not a file:// feed
+        pageable = start_url.startswith(("http://", "https://"))
+        if pageable:
+            d = self.get_json(self.page_url(start_url, 1, self.page_size))
+        else:
+            d = self.get_json(start_url)
+        if d == "NULL":
+            # get_json has already retried and logged the error
+            raise RuntimeError(f"could not get {start_url}")
 
-        while True:
-            d = processor.get_json(url)
-            if d != "NULL":
-                datasets += d["data"]
-                if "next" in d["meta"] and d["meta"]["next"]:
-                    url = d["meta"]["next"]
-                    print(f"Next {url}")
-                else:
-                    break
+        datasets = None
+        total = d["meta"].get("stats", {}).get("totalCount")
+        if pageable and total is not None:
+            datasets = self.get_pages(start_url, d, total)
+        if datasets is None:
+            datasets = self.follow_next(d)
 
         print(f"Found {len(datasets)} datasets")
 
-        prepped = []
-        for e in datasets:
-            prepped.append(
-                [
-                    e["attributes"].get("name", ""),
-                    e["attributes"].get("source", ""),
-                    e.get("links", {}).get("itemPage", ""),
-                    "",  # Link to data
-                    "", #FileName
-                    datetime.utcfromtimestamp(
-                        e["attributes"].get("created", 0) / 1000
-                    ).strftime("%Y-%m-%d"),
-                    datetime.utcfromtimestamp(
-                        e["attributes"].get("modified", 0) / 1000
-                    ).strftime("%Y-%m-%d"),
-                    # ^^ Should really do something better than defaulting to start of epoch
-                    e["attributes"].get("size", ""),
-                    "bytes",
-                    e["attributes"].get("type", ""),
-                    e["attributes"].get("recordCount", ""),
-                    ";".join(e["attributes"].get("tags", [])),
-                    "",  # Manual tags
-                    self.get_license(e),  # license
-                    e["attributes"].get("searchDescription", ""),
-                ]
-            )
-        processor.write_csv(fname, prepped)
+        with self.open_csv(fname) as sink:
+            for e in datasets:
+                sink.writerow(
+                    CatalogueRecord(
+                        Title=e["attributes"].get("name", ""),
+                        Owner=e["attributes"].get("source", ""),
+                        PageURL=e.get("links", {}).get("itemPage", ""),
+                        DateCreated=normalise_date(e["attributes"].get("created", 0)),
+                        DateUpdated=normalise_date(e["attributes"].get("modified", 0)),
+                        # ^^ Should really do something better than defaulting to start of epoch
+                        FileSize=e["attributes"].get("size", ""),
+                        FileSizeUnit="bytes",
+                        FileType=e["attributes"].get("type", ""),
+                        NumRecords=e["attributes"].get("recordCount", ""),
+                        OriginalTags=";".join(e["attributes"].get("tags", [])),
+                        License=self.get_license(e),
+                        Description=e["attributes"].get("searchDescription", ""),
+                    )
+                )
+
+
+    def get_pages(self, start_url, d, total):
+        """Fetches the pages after the first page d all at once, rather than following "next" links
+
+        Returns the datasets from every page, or None if a page repeats
+        datasets already seen, as when the hub ignores page[number]. Raises
+        RuntimeError if a page couldn't be fetched.
+        """
+        datasets = list(d["data"])
+        size = len(d["data"])
+        page_count = -(-total // size) if size else 1
+        urls = [
+            self.page_url(start_url, number, size) for number in range(2, page_count + 1)
+        ]
+        print(f"Fetching {len(urls)} more pages of {size}")
+        seen = dataset_ids(datasets)
+        for url, page in zip(urls, self.get_json_many(urls)):
+            if page == "NULL":
+                raise RuntimeError(f"could not get {url}")
+            ids = dataset_ids(page["data"])
+            if not ids.isdisjoint(seen):
+                print(f"{url} repeats datasets from earlier pages, following next links")
+                return None
+            seen |= ids
+            datasets += page["data"]
+        return datasets
+
+    def follow_next(self, d):
+        """Fetches the pages after the first page d one at a time, by their "next" links
+
+        Returns the datasets from every page. Raises RuntimeError if a page couldn't be fetched.
+        """
+        datasets = list(d["data"])
+        while "next" in d["meta"] and d["meta"]["next"]:
+            url = d["meta"]["next"]
+            print(f"Next {url}")
+            d = self.get_json(url)
+            if d == "NULL":
+                raise RuntimeError(f"could not get {url}")
+            datasets += d["data"]
+        return datasets
+
+
+def dataset_ids(datasets):
+    return {e["id"] for e in datasets if e.get("id")}
 
 
 processor = ProcessorARCGIS()
 
 if __name__ == "__main__":
-    processor.process()
+    processor.main()
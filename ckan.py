@@ -1,9 +1,57 @@
-from processor import Processor
+from urllib import parse
+import csv
+import json
+import os
+
+try:
+    from processor import Processor
+    from records import CatalogueRecord
+except:
+    from .processor import Processor
+    from .records import CatalogueRecord
+
+
+# TEMP FIX: PHS, Dundee and Stirling have some unicode chars that break the CSV, so their
+# descriptions are unicode_escape'd in the csv. The parquet copy doesn't need this.
+UNICODE_ESCAPE_OWNERS = {
+    "Public Health Scotland",
+    "Dundee City Council",
+    "Stirling Council",
+}
+
+
+# what get_datasets leaves in data/ckan/ for each portal
+OUTPUT_SUFFIXES = (".state.json", ".csv", ".parquet")
 
 
 class ProcessorCKAN(Processor):
     def __init__(self):
         super().__init__(type="ckan")
+        self.page_size = 1000
+        # Only fetch packages modified since the last run, see update_datasets
+        self.incremental = True
+
+    def process(self, workers=1):
+        self.get_urls()
+        self.prune_outputs()
+        return super().process(workers)
+
+    def prune_outputs(self):
+        """Deletes the outputs of portals no longer in sources.csv.
+
+        data/ckan/ is kept between runs for the incremental harvest, so
+        nothing else would stop a removed portal being merged forever.
+        """
+        folder = os.path.join("data", self.type)
+        if not os.path.isdir(folder):
+            return
+        for fname in os.listdir(folder):
+            for suffix in OUTPUT_SUFFIXES:
+                if fname.endswith(suffix):
+                    if fname[: -len(suffix)] not in self.urls:
+                        print(f"Removing {fname}, its portal is no longer a source")
+                        os.remove(os.path.join(folder, fname))
+                    break
 
     def get_datasets(self, portal_owner, start_url, fname):
         print(f"Processing {start_url}")
@@ -14,93 +62,225 @@ class ProcessorCKAN(Processor):
         if url[-1] != "/":
             url = url + "/"
 
-        datasets = processor.get_json(f"{url}/api/3/action/package_list")
-        if datasets != "NULL":
+        state = self.load_state(fname)
+        if self.incremental and state and os.path.exists(fname):
+            if self.update_datasets(portal_owner, url, fname, state):
+                return
 
-            print(f"Found {len(datasets['result'])} datasets")
+        page = self.search_packages(url, 0)
+        if page != "NULL":
+            print(f"Found {page['count']} datasets")
 
-            prepped = []
-            for dataset_name in datasets["result"]:
-                dataset_metadata = processor.get_json(
-                    f"{url}/api/3/action/package_show?id={dataset_name}"
-                )
+            packages = {}
+            modified = ""
+            with self.open_portal_csv(fname, portal_owner) as sink:
+                for dataset_metadata in self.iter_search(url, page):
+                    self.write_dataset(sink, portal_owner, url, dataset_metadata)
+                    packages[dataset_metadata["id"]] = dataset_metadata["name"]
+                    modified = max(modified, dataset_metadata["metadata_modified"])
+            self.save_state(fname, {"metadata_modified": modified, "packages": packages})
+            return
 
+        ### fall back to one package_show per dataset for portals without search
+        list_url = f"{url}/api/3/action/package_list"
+        datasets = self.get_json(list_url)
+        if datasets == "NULL":
+            raise RuntimeError(f"could not get {list_url}")
+
+        print(f"Found {len(datasets['result'])} datasets")
+
+        package_urls = [
+            f"{url}/api/3/action/package_show?id={dataset_name}"
+            for dataset_name in datasets["result"]
+        ]
+        with self.open_portal_csv(fname, portal_owner) as sink:
+            for dataset_name, package_url, dataset_metadata in zip(
+                datasets["result"], package_urls, self.get_json_many(package_urls)
+            ):
+                if dataset_metadata == "NULL":
+                    raise RuntimeError(f"could not get {package_url}")
                 print(
                     f"Got {dataset_name} with success status: {dataset_metadata['success']}"
                 )
 
-                dataset_metadata = dataset_metadata["result"]
+                self.write_dataset(sink, portal_owner, url, dataset_metadata["result"])
+
+    def update_datasets(self, portal_owner, url, fname, state):
+        """Merges the packages modified since the last harvest into fname.
+
+        Packages whose id has disappeared from the portal are dropped, and
+        rows for everything else are copied over from the previous CSV.
+        Returns False if the portal cannot be queried incrementally.
+        """
+        since = state["metadata_modified"][:19] + "Z"
+        changed_query = {"fq": f"metadata_modified:[{since} TO *]"}
+
+        page = self.search_packages(url, 0, fl="id,name")
+        if page == "NULL":
+            return False
+        packages = {
+            d["id"]: d["name"] for d in self.iter_search(url, page, fl="id,name")
+        }
+        page = self.search_packages(url, 0, **changed_query)
+        if page == "NULL":
+            return False
+        changed = {d["name"]: d for d in self.iter_search(url, page, **changed_query)}
+
+        ### packages we have no rows for but that were not modified, e.g. made public
+        unseen = [
+            packages[package_id]
+            for package_id in packages.keys() - state["packages"].keys()
+            if packages[package_id] not in changed
+        ]
+        package_urls = [f"{url}api/3/action/package_show?id={name}" for name in unseen]
+        for name, package_url, dataset_metadata in zip(
+            unseen, package_urls, self.get_json_many(package_urls)
+        ):
+            if dataset_metadata == "NULL":
+                raise RuntimeError(f"could not get {package_url}")
+            changed[name] = dataset_metadata["result"]
+
+        removed = state["packages"].keys() - packages.keys()
+        print(
+            f"Found {len(packages)} datasets, {len(changed)} changed and {len(removed)} removed since {since}"
+        )
+
+        page_prefix = f"{url}dataset/"
+        previous = {}
+        with open(fname, "r", newline="", encoding="utf-8") as csvf:
+            rows = csv.reader(csvf)
+            next(rows)
+            for r in rows:
+                if portal_owner in UNICODE_ESCAPE_OWNERS:
+                    # the sink escapes them again
+                    r[-1] = r[-1].encode().decode("unicode_escape")
+                previous.setdefault(r[2][len(page_prefix) :], []).append(r)
 
-                ### gets provided owner name if exists, else uses the owner of the portal.
-                if (
-                    "organization" in dataset_metadata
-                    and "title" in dataset_metadata["organization"]
-                ):
-                    owner = dataset_metadata["organization"]["title"]
+        modified = state["metadata_modified"]
+        with self.open_portal_csv(fname, portal_owner) as sink:
+            for name in sorted(packages.values()):
+                if name in changed:
+                    dataset_metadata = changed[name]
+                    self.write_dataset(sink, portal_owner, url, dataset_metadata)
+                    modified = max(modified, dataset_metadata["metadata_modified"])
                 else:
-                    owner = portal_owner
-
-                # TEMP FIX: PHS uses CKAN org objects as categories for some reason, overwrite them with PHS until we can make an org filtering system
-                if portal_owner == "Public Health Scotland":
-                    owner = portal_owner
-
-                for resource in dataset_metadata["resources"]:
-                    tags = list(map(lambda x: x["name"], dataset_metadata["tags"]))
-
-                    file_size = 0
-
-                    if "archiver" in resource and "size" in resource["archiver"]:
-                        file_size = resource["archiver"]["size"]
-                    elif "size" in resource:
-                        file_size = resource["size"]
-
-                    file_type = ""
-
-                    if resource["format"]:
-                        file_type = resource["format"]
-                    elif "qa" in resource and "format" in resource["qa"]:
-                        file_type = resource["qa"]["format"]
-                    elif "resource:format" in resource:
-                        file_type = resource["resource:format"]
-                    elif "service_type" in resource:
-                        file_type = resource["service_type"]
-                    elif "is_wfs" in resource and resource["is_wfs"] == "yes":
-                        file_type = "WFS"
-
-                    description = dataset_metadata["notes"]
-
-                    # TEMP FIX: PHS, Dundee and Stirling have some unicode chars that break the CSV. Long term we will sort this by using JSON
-                    if (
-                        portal_owner == "Public Health Scotland"
-                        or portal_owner == "Dundee City Council"
-                        or portal_owner == "Stirling Council"
-                    ):
-                        description = (
-                            dataset_metadata["notes"].encode("unicode_escape").decode()
-                        )
-
-                    prepped.append(
-                        [
-                            dataset_metadata["title"],  # Title
-                            owner,  # Owner
-                            f"{url}dataset/{dataset_name}",  # PageURL
-                            resource["url"],  # AssetURL
-                            resource["name"],  # FileName
-                            dataset_metadata["metadata_created"],  # DateCreated
-                            dataset_metadata["metadata_modified"],  # DateUpdated
-                            file_size,  # FileSize
-                            "B",  # FileSizeUnit
-                            file_type,  # FileType
-                            None,  # NumRecords
-                            ";".join(tags),  # OriginalTags
-                            None,  # ManualTags
-                            dataset_metadata["license_title"],  # License
-                            description,  # Description
-                        ]
-                    )
-
-                processor.write_csv(fname, prepped)
+                    sink.writerows(previous.get(name, []))
+        self.save_state(fname, {"metadata_modified": modified, "packages": packages})
+        return True
+
+    def open_portal_csv(self, fname, portal_owner):
+        return self.open_csv(
+            fname, escape_unicode=portal_owner in UNICODE_ESCAPE_OWNERS
+        )
+
+    def search_packages(self, url, start, **params):
+        """Gets one page of full package dicts from package_search.
+
+        Sorted by name to match the order of package_list. Returns "NULL" if
+        the portal has search disabled or the request failed.
+        """
+        params = parse.urlencode(
+            {
+                "q": "*:*",
+                "sort": "name asc",
+                "rows": self.page_size,
+                "start": start,
+                **params,
+            }
+        )
+        page = self.get_json(f"{url}api/3/action/package_search?{params}")
+        if page == "NULL" or not page.get("success"):
+            return "NULL"
+        return page["result"]
+
+    def iter_search(self, url, page, **params):
+        """Yields the packages on page and on every package_search page after it"""
+        start = 0
+        while True:
+            yield from page["results"]
+            start += len(page["results"])
+            if not page["results"] or start >= page["count"]:
+                return
+            page = self.search_packages(url, start, **params)
+            if page == "NULL":
+                raise RuntimeError(f"package_search failed at {start}")
+
+    def state_fname(self, fname):
+        return os.path.splitext(fname)[0] + ".state.json"
+
+    def load_state(self, fname):
+        """Loads the high-water mark and package ids saved by the last harvest"""
+        try:
+            with open(self.state_fname(fname), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_state(self, fname, state):
+        state_fname = self.state_fname(fname)
+        with open(state_fname + ".part", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(state_fname + ".part", state_fname)
+
+    def write_dataset(self, sink, portal_owner, url, dataset_metadata):
+        ### gets provided owner name if exists, else uses the owner of the portal.
+        if (
+            "organization" in dataset_metadata
+            and "title" in dataset_metadata["organization"]
+        ):
+            owner = dataset_metadata["organization"]["title"]
+        else:
+            owner = portal_owner
+
+        # TEMP FIX: PHS uses CKAN org objects as categories for some reason, overwrite them with PHS until we can make an org filtering system
+        if portal_owner == "Public Health Scotland":
+            owner = portal_owner
+
+        for resource in dataset_metadata["resources"]:
+            tags = list(map(lambda x: x["name"], dataset_metadata["tags"]))
+
+            file_size = 0
+
+            if "archiver" in resource and "size" in resource["archiver"]:
+                file_size = resource["archiver"]["size"]
+            elif "size" in resource:
+                file_size = resource["size"]
+
+            file_type = ""
+
+            if resource["format"]:
+                file_type = resource["format"]
+            elif "qa" in resource and "format" in resource["qa"]:
+                file_type = resource["qa"]["format"]
+            elif "resource:format" in resource:
+                file_type = resource["resource:format"]
+            elif "service_type" in resource:
+                file_type = resource["service_type"]
+            elif "is_wfs" in resource and resource["is_wfs"] == "yes":
+                file_type = "WFS"
+
+            sink.writerow(
+                CatalogueRecord(
+                    Title=dataset_metadata["title"],
+                    Owner=owner,
+                    PageURL=f"{url}dataset/{dataset_metadata['name']}",
+                    AssetURL=resource["url"],
+                    FileName=resource["name"],
+                    DateCreated=dataset_metadata["metadata_created"],
+                    DateUpdated=dataset_metadata["metadata_modified"],
+                    FileSize=file_size,
+                    FileSizeUnit="B",
+                    FileType=file_type,
+                    NumRecords=None,
+                    OriginalTags=";".join(tags),
+                    ManualTags=None,
+                    License=dataset_metadata["license_title"],
+                    Description=dataset_metadata["notes"],
+                )
+            )
 
 
 processor = ProcessorCKAN()
-processor.process()
+
+if __name__ == "__main__":
+    processor.main()
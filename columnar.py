@@ -0,0 +1,133 @@
+"""Parquet copies of the pipeline's csvs, for when pyarrow is installed.
+
+The processors write <name>.parquet next to each <name>.csv, and
+merge_data.py writes data/merged_output.parquet, so the next stage can
+read a typed, memory mapped table instead of parsing the csv again. The
+csvs are always written and stay the canonical output; without pyarrow
+nothing here is used.
+"""
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+available = pq is not None
+
+
+def parquet_fname(fname):
+    return os.path.splitext(fname)[0] + ".parquet"
+
+
+def string_column(values):
+    """Converts values to an arrow string array, with missing values as nulls"""
+    return pa.array(
+        [None if v is None or v != v else str(v) for v in values], type=pa.string()
+    )
+
+
+class ParquetSink:
+    """Streams rows into a Parquet file, a row group at a time.
+
+    Every column is a string, as in the csv. Like CSVSink, rows go to a
+    temporary file that only replaces fname on close.
+    """
+
+    def __init__(self, fname, header, row_group_size=10000):
+        self.fname = fname
+        self.tmp_fname = fname + ".part"
+        self.header = list(header)
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.schema = pa.schema([(name, pa.string()) for name in self.header])
+        self.writer = pq.ParquetWriter(self.tmp_fname, self.schema)
+
+    def writerow(self, r):
+        self.rows.append(r)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        if len(columns) != len(self.header):
+            raise ValueError(
+                f"rows have {len(columns)} fields but the header has {len(self.header)}"
+            )
+        self.rows = []
+        self.writer.write_table(
+            pa.Table.from_arrays(
+                [string_column(column) for column in columns], schema=self.schema
+            )
+        )
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        os.replace(self.tmp_fname, self.fname)
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.tmp_fname)
+
+
+def write_frame(dataframe, fname):
+    """Writes dataframe to fname as a Parquet file of string columns"""
+    table = pa.Table.from_arrays(
+        [string_column(dataframe[name]) for name in dataframe.columns],
+        names=[str(name) for name in dataframe.columns],
+    )
+    pq.write_table(table, fname + ".part")
+    os.replace(fname + ".part", fname)
+
+
+def fresh_parquet(fname):
+    """Gets the Parquet copy of the csv fname, or None without pyarrow or a copy as new"""
+    if not available:
+        return None
+    parquet = parquet_fname(fname)
+    try:
+        if os.path.getmtime(parquet) < os.path.getmtime(fname):
+            return None
+    except OSError:
+        return None
+    return parquet
+
+
+def strings_frame(dataframe):
+    return dataframe.astype(object).where(
+        dataframe.notna() & (dataframe != ""), float("nan")
+    )
+
+
+def read_frame(fname, columns=None):
+    """Reads the Parquet copy of the csv fname into a dataframe of strings.
+
+    Missing and empty values are NaN, as pandas.read_csv would give.
+    Returns None if pyarrow isn't installed, or there is no copy at least
+    as new as fname.
+    """
+    parquet = fresh_parquet(fname)
+    if parquet is None:
+        return None
+    return strings_frame(
+        pq.read_table(parquet, columns=columns, memory_map=True).to_pandas()
+    )
+
+
+def iter_frames(fname, batch_size=10000, columns=None):
+    """Like read_frame, but returns an iterator of dataframes of up to batch_size rows"""
+    parquet = fresh_parquet(fname)
+    if parquet is None:
+        return None
+    return _iter_batches(parquet, batch_size, columns)
+
+
+def _iter_batches(parquet, batch_size, columns):
+    with pq.ParquetFile(parquet, memory_map=True) as f:
+        for batch in f.iter_batches(batch_size=batch_size, columns=columns):
+            yield strings_frame(batch.to_pandas())
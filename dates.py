@@ -0,0 +1,54 @@
+"""Normalises the dates the sources publish to one format, YYYY-MM-DD.
+
+Most sources give ISO-8601 strings or, for arcgis, milliseconds since the
+epoch; both are read without dateutil. Anything else falls back to
+dateutil, reading ambiguous dates day first as the sources are Scottish.
+"""
+from datetime import date, datetime, timezone
+from functools import lru_cache
+import math
+
+from dateutil import parser
+
+
+def normalise_date(value):
+    """Gets value as a YYYY-MM-DD string.
+
+    Strings keep the date as written, ignoring any time or time zone.
+    Numbers are taken as milliseconds since the epoch, in UTC. Returns ""
+    for missing values or anything that can't be read as a date.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and math.isnan(value):
+            return ""
+        return epoch_ms_date(value)
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return parse_date(str(value))
+
+
+@lru_cache(maxsize=4096)
+def epoch_ms_date(value):
+    try:
+        return datetime.fromtimestamp(value / 1000, timezone.utc).strftime("%Y-%m-%d")
+    except (OverflowError, OSError, ValueError):
+        return ""
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value):
+    value = value.strip()
+    if not value or value.lower() in ("nan", "nat", "null", "none"):
+        return ""
+    # fast path: anything starting YYYY-MM-DD, e.g. 2021-01-13, 2021-01-13T17:10:11.697Z
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        try:
+            return date.fromisoformat(value[:10]).isoformat()
+        except ValueError:
+            pass
+    try:
+        return parser.parse(value, dayfirst=True).strftime("%Y-%m-%d")
+    except (OverflowError, ValueError):
+        return ""
@@ -1,10 +1,13 @@
-import copy
-from dateutil import parser
-
 try:
     from processor import Processor
+    from json_stream import iter_items
+    from dates import normalise_date
+    from records import CatalogueRecord
 except:
     from .processor import Processor
+    from .json_stream import iter_items
+    from .dates import normalise_date
+    from .records import CatalogueRecord
 
 
 class ProcessorDCAT(Processor):
@@ -12,50 +15,50 @@ class ProcessorDCAT(Processor):
         super().__init__(type="dcat")
 
     def get_datasets(self, owner, start_url, fname):
-        d = processor.get_json(start_url)
-        if d != "NULL":
+        stream = self.open_json(start_url)
+        if stream == "NULL":
+            # open_json has already retried and logged the error
+            raise RuntimeError(f"could not get {start_url}")
+
+        # datasets are parsed one at a time as the feed downloads
+        datasets = 0
 
-            datasets = d["dcat:dataset"]
+        with stream, self.open_csv(fname) as sink:
+            for e in iter_items(stream, "dcat:dataset"):
+                datasets += 1
+                sink.writerows(self.dataset_rows(e))
 
-            print(f"Found {len(datasets)} datasets")
+            print(f"Found {datasets} datasets")
+            print(f"{sink.rows} lines for csv")
 
-            prepped = []
-            for e in datasets:
-                ds = [
-                    e.get("dct:title", ""),
-                    e.get("dct:publisher", "").replace(" Mapping", ""),
-                    "",  # link to page
-                    "",  # Link to data
-                    "",  #FileName
-                    "",  # date created
-                    parser.parse(e.get("dct:issued", "")).date(),
-                    "",  # size
-                    "",  # size unit
-                    "",  # filetype
-                    "",  # numrecords
-                    ";".join(e.get("dcat:keyword", [])),
-                    "",  # Manual tags
-                    "",  # license
-                    e.get("dct:description", "").strip("\u200b"),
-                ]
-                pages = e.get("dcat:distribution")
-                for p in pages:
-                    if p.get("dct:description", "") == "Web Page":
-                        ds[2] = p.get("dcat:accessUrl", "")
-                        break
-                dsl = []
-                for p in pages:
-                    if p.get("dct:description", "") == "Web Page":
-                        continue
-                    ds[3] = p.get("dcat:accessUrl", "")
-                    ds[9] = p.get("dct:title", "")
-                    dsl.append(copy.deepcopy(ds))
-                if not dsl:
-                    dsl.append(ds)
-                prepped += dsl
+    def dataset_rows(self, e):
+        """Gets a csv row for each distribution of a DCAT dataset.
 
-            print(f"{len(prepped)} lines for csv")
-            processor.write_csv(fname, prepped)
+        The dataset's fields are built once as a CatalogueRecord and each
+        distribution only replaces the link to the data and the file type.
+        """
+        pages = e.get("dcat:distribution") or []
+        page_url = ""
+        for p in pages:
+            if p.get("dct:description", "") == "Web Page":
+                page_url = p.get("dcat:accessUrl", "")
+                break
+        ds = CatalogueRecord(
+            Title=e.get("dct:title", ""),
+            Owner=e.get("dct:publisher", "").replace(" Mapping", ""),
+            PageURL=page_url,
+            DateUpdated=normalise_date(e.get("dct:issued", "")),
+            OriginalTags=";".join(e.get("dcat:keyword", [])),
+            Description=e.get("dct:description", "").strip("\u200b"),
+        )
+        rows = [
+            ds._replace(
+                AssetURL=p.get("dcat:accessUrl", ""), FileType=p.get("dct:title", "")
+            )
+            for p in pages
+            if p.get("dct:description", "") != "Web Page"
+        ]
+        return rows or [ds]
 
 
 def get_license(dataset):
@@ -68,4 +71,4 @@ def get_license(dataset):
 processor = ProcessorDCAT()
 
 if __name__ == "__main__":
-    processor.process()
+    processor.main()
@@ -1,13 +1,47 @@
 import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import List
 from math import isnan
 import markdown
 import re
 import yaml
-import shutil
+import hashlib
+import json
 import os
-import urllib
+import unicodedata
+
+try:
+    from records import MERGED_FIELDS
+    import columnar
+except:
+    from .records import MERGED_FIELDS
+    from . import columnar
+
+
+# the hashes of the files written by the last export, kept in the output folder
+MANIFEST = ".export2jkan-manifest.json"
+
+# the file each dataset was written to, by PageURL then Title, see load_index
+INDEX = ".export2jkan-index.json"
+
+# dataset filenames are a slug of up to SLUG_LENGTH characters and a hash
+SLUG_LENGTH = 80
+HASH_LENGTH = 8
+
+# descriptions rendered to html by previous exports
+MARKDOWN_CACHE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "markdown.json"
+)
+
+# libyaml's emitter is much faster, and gives the same output as PyYAML's
+# as long as long strings aren't folded across lines
+YAMLDumper = getattr(yaml, "CDumper", yaml.Dumper)
+YAML_WIDTH = 2**30
+
+# the rows of a dataset share these, and merge_data.py sorts its output by them
+KEY_FIELDS = ["PageURL", "Title"]
 
 
 @dataclass
@@ -34,36 +68,6 @@ class Dataset:
     files: List[DataFile]
 
 
-fulld = pd.read_csv(
-    "data/merged_output.csv", dtype=str, na_filter=False, lineterminator="\n"
-)
-
-
-def ind(name):
-    f = [
-        "Title",
-        "Owner",
-        "PageURL",
-        "AssetURL",
-        "FileName",
-        "DateCreated",
-        "DateUpdated",
-        "FileSize",
-        "FileSizeUnit",
-        "FileType",
-        "NumRecords",
-        "OriginalTags",
-        "ManualTags",
-        "License",
-        "Description",
-        "Source",
-        "AssetStatus",
-        "CombinedTags",
-        "ODSCategories",
-    ]
-    return f.index(name)
-
-
 def splittags(tags):
     if type(tags) == str:
         if tags == "":
@@ -85,37 +89,135 @@ def makeint(val):
     return None
 
 
-data = {}
-for r in fulld.values:
-    id = str(r[ind("PageURL")]) + r[ind("Title")]
-    if id not in data:
-        ds = Dataset(
-            title=r[ind("Title")],
-            owner=r[ind("Owner")],
-            page_url=r[ind("PageURL")],
-            date_created=r[ind("DateCreated")],
-            date_updated=r[ind("DateUpdated")].removesuffix(" 00:00:00.000"),
-            ods_categories=splittags(r[ind("ODSCategories")]),
-            license=r[ind("License")],
-            description=str(r[ind("Description")]),
-            num_records=makeint(r[ind("NumRecords")]),
-            files=[],
+def read_frames(fname, batch_size=10000, columns=None):
+    """Reads the merged output a batch of rows at a time, as dataframes of strings"""
+    frames = columnar.iter_frames(fname, batch_size, columns)
+    if frames is None:
+        return pd.read_csv(
+            fname,
+            dtype=str,
+            na_filter=False,
+            lineterminator="\n",
+            usecols=columns,
+            chunksize=batch_size,
         )
+    return (frame.fillna("") for frame in frames)
+
+
+def is_grouped(fname):
+    """Checks whether all the rows of each dataset are next to each other in fname"""
+    seen = set()
+    previous = None
+    for frame in read_frames(fname, columns=KEY_FIELDS):
+        for key in zip(frame["PageURL"], frame["Title"]):
+            if key != previous:
+                if key in seen:
+                    return False
+                seen.add(key)
+                previous = key
+    return True
+
 
-        # Sort categories to keep consistent when syncing
-        ds.ods_categories.sort()
-
-        data[id] = ds
-    data[id].files.append(
-        DataFile(
-            url=r[ind("AssetURL")],
-            size=r[ind("FileSize")],
-            size_unit=r[ind("FileSizeUnit")],
-            file_type=r[ind("FileType")],
-            file_name=r[ind("FileName")],
-            show_name=r[ind("FileName")] if r[ind("FileName")] else r[ind("FileType")],
+def iter_records(fname):
+    """Yields the rows of the merged output as MergedRecords, grouped by dataset
+
+    merge_data.py sorts its output by PageURL and Title, so the rows are
+    streamed a batch at a time. Rows that aren't grouped, e.g. from an
+    older merged output, are read and sorted in memory first.
+    """
+    if is_grouped(fname):
+        frames = read_frames(fname)
+    else:
+        print(f"{fname} isn't grouped by dataset, sorting it in memory")
+        frame = pd.concat(read_frames(fname), ignore_index=True)
+        frames = [frame.sort_values(KEY_FIELDS, kind="stable")]
+    for frame in frames:
+        yield from frame[list(MERGED_FIELDS)].itertuples(
+            index=False, name="MergedRecord"
         )
-    )
+
+
+def iter_datasets(records):
+    """Yields a Dataset for each run of records with the same PageURL and Title"""
+    ds = None
+    for r in records:
+        if ds is None or (r.PageURL, r.Title) != (ds.page_url, ds.title):
+            if ds is not None:
+                yield ds
+            ds = Dataset(
+                title=r.Title,
+                owner=r.Owner,
+                page_url=r.PageURL,
+                date_created=r.DateCreated,
+                date_updated=r.DateUpdated.removesuffix(" 00:00:00.000"),
+                ods_categories=splittags(r.ODSCategories),
+                license=r.License,
+                description=str(r.Description),
+                num_records=makeint(r.NumRecords),
+                files=[],
+            )
+
+            # Sort categories to keep consistent when syncing
+            ds.ods_categories.sort()
+
+        ds.files.append(
+            DataFile(
+                url=r.AssetURL,
+                size=r.FileSize,
+                size_unit=r.FileSizeUnit,
+                file_type=r.FileType,
+                file_name=r.FileName,
+                show_name=r.FileName if r.FileName else r.FileType,
+            )
+        )
+    if ds is not None:
+        yield ds
+
+
+def slugify(text, length=SLUG_LENGTH):
+    """Gets text as lowercase ascii words joined by "-", at most length characters long"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug[:length].rstrip("-") or "dataset"
+
+
+def dataset_filename(ds, hash_length=HASH_LENGTH):
+    """Gets the name of a dataset's markdown file, e.g. owner-title-1a2b3c4d.md
+
+    The slug of the owner and title is cut short so names stay well within
+    filesystem limits, and a hash of the dataset's PageURL and Title keeps
+    datasets that share an owner and title apart.
+    """
+    key = json.dumps([ds.page_url, ds.title])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:hash_length]
+    return f"{slugify(f'{ds.owner}-{ds.title}')}-{digest}.md"
+
+
+def name_datasets(datasets, index):
+    """Yields (filename, dataset) for each dataset, with no two datasets sharing a file
+
+    Each dataset's filename is recorded in index, as {PageURL: {Title: filename}}.
+    In the unlikely event that two datasets' short hashes match, the later
+    one gets the full hash.
+    """
+    taken = {}
+    for ds in datasets:
+        key = (ds.page_url, ds.title)
+        fname = dataset_filename(ds)
+        if taken.setdefault(fname, key) != key:
+            fname = dataset_filename(ds, hash_length=None)
+            taken[fname] = key
+        index.setdefault(ds.page_url, {})[ds.title] = fname
+        yield fname, ds
+
+
+def load_index(output_dir):
+    """Loads {PageURL: {Title: filename}} for the datasets written by the last export"""
+    try:
+        with open(os.path.join(output_dir, INDEX), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 
 unknown_lics = []
@@ -184,16 +286,17 @@ def license_link(l):
 
     md = markdown.Markdown()
 
-### Replace folder by deleting and writing
-shutil.rmtree("../jkan/_datasets/")
-os.makedirs("../jkan/_datasets/")
+def render_dataset(ds, notes=None):
+    """Gets the contents of a dataset's jkan markdown file
 
-
-for n, (k, ds) in enumerate(data.items()):
+    notes is the description rendered as html, if it has been already.
+    """
+    if notes is None:
+        notes = markdown.markdown(ds.description)
     y = {"schema": "default"}
     y["title"] = ds.title
     y["organization"] = ds.owner
-    y["notes"] = markdown.markdown(ds.description)
+    y["notes"] = notes
     y["original_dataset_link"] = ds.page_url
     y["resources"] = [
         {"name": d.show_name, "url": d.url, "format": d.file_type}
@@ -206,12 +309,229 @@ for n, (k, ds) in enumerate(data.items()):
     y["date_created"] = ds.date_created
     y["date_updated"] = ds.date_updated
     y["records"] = ds.num_records
-    # fn = f'{ds.owner}-{ds.title}'
-    # fn = re.sub(r'[^\w\s-]', '', fn).strip()[:100]
-    fn = urllib.parse.quote_plus(f"{(ds.owner).lower()}-{(ds.title).lower()}")
-    # fn = {ds.owner}-{ds.title})
-    # ^^ need something better for filnames...
-    with open(f"../jkan/_datasets/{fn}.md", "w") as f:
-        f.write("---\n")
-        f.write(yaml.dump(y))
-        f.write("---\n")
+    return "---\n" + yaml.dump(y, Dumper=YAMLDumper, width=YAML_WIDTH) + "---\n"
+
+
+def render_chunk(chunk):
+    """Renders [(filename, dataset, description hash, notes or None)] in a worker process
+
+    Returns [(filename, contents, description hash, notes)], so the notes
+    can be cached.
+    """
+    rendered = []
+    for fname, ds, key, notes in chunk:
+        if notes is None:
+            notes = markdown.markdown(ds.description)
+        rendered.append((fname, render_dataset(ds, notes), key, notes))
+    return rendered
+
+
+def description_key(description):
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+class MarkdownCache:
+    """Descriptions rendered to html by the last export, by a hash of the description.
+
+    Only the entries used by this export are saved, so the cache doesn't
+    grow forever. The cache is dropped when the markdown version changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.cached = {}
+        self.used = {}
+        self.misses = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("markdown") == markdown.__version__:
+                self.cached = cache["notes"]
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key):
+        notes = self.cached.get(key)
+        if notes is None:
+            self.misses += 1
+        return notes
+
+    def put(self, key, notes):
+        self.used[key] = notes
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        content = json.dumps({"markdown": markdown.__version__, "notes": self.used})
+        write_atomic(self.path, content)
+
+
+def render_jobs(datasets, cache):
+    for fname, ds in datasets:
+        key = description_key(ds.description)
+        yield fname, ds, key, cache.get(key)
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_datasets(datasets, cache, workers=None, chunk_size=200):
+    """Renders each dataset's markdown file, in chunks across a process pool
+
+    Only a few chunks are in flight at once, so datasets are read from the
+    iterable no faster than they are rendered. Descriptions in the markdown
+    cache aren't rendered again.
+
+    Args:
+        datasets (iterable): (filename, Dataset) pairs
+        cache (MarkdownCache): the html of previously rendered descriptions
+        workers (int): the number of processes, by default one per cpu
+        chunk_size (int): the number of datasets sent to a process at a time
+
+    Yields:
+        (str, str): the filename and contents of each file
+    """
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunked(render_jobs(datasets, cache), chunk_size):
+            pending.append(executor.submit(render_chunk, chunk))
+            while len(pending) > window or (pending and pending[0].done()):
+                yield from cached_files(pending.popleft().result(), cache)
+        while pending:
+            yield from cached_files(pending.popleft().result(), cache)
+
+
+def cached_files(rendered, cache):
+    for fname, content, key, notes in rendered:
+        cache.put(key, notes)
+        yield fname, content
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, content):
+    """Writes content to a hidden .part file, then renames it over path
+
+    Like CSVSink, the file is opened normally so it gets the usual
+    permissions, and jekyll ignores it while it's hidden.
+    """
+    directory, fname = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{fname}.part")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(output_dir):
+    """Loads {filename: content hash} for the files written by the last export, or None"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def sync_datasets(files, output_dir):
+    """Makes output_dir hold exactly files, only writing or deleting what has changed
+
+    Files are written as they come, and only their hashes are kept, so
+    files can be a generator.
+
+    Files whose content hash matches the manifest of the last export are
+    left alone, so unchanged datasets keep their timestamps and git sees
+    no diff. Without a manifest every .md file in output_dir is treated as
+    a previous export's, as the folder used to be replaced wholesale.
+
+    Args:
+        files (iterable): (filename, contents) of each markdown file
+        output_dir (str): the jkan _datasets folder
+
+    Returns:
+        dict: the number of files added, changed, removed and unchanged
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        manifest = {
+            fname: None for fname in os.listdir(output_dir) if fname.endswith(".md")
+        }
+
+    counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    hashes = {}
+    for fname, content in files:
+        path = os.path.join(output_dir, fname)
+        hashes[fname] = content_hash(content)
+        if fname in manifest and os.path.exists(path):
+            if manifest[fname] is None:
+                # no manifest yet, so hash what's on disk
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest[fname] = content_hash(f.read())
+            if manifest[fname] == hashes[fname]:
+                counts["unchanged"] += 1
+                continue
+            counts["changed"] += 1
+        else:
+            counts["added"] += 1
+        write_atomic(path, content)
+
+    for fname in manifest.keys() - hashes.keys():
+        try:
+            os.remove(os.path.join(output_dir, fname))
+        except FileNotFoundError:
+            pass
+        counts["removed"] += 1
+
+    manifest = json.dumps(hashes, indent=0, sort_keys=True)
+    write_atomic(os.path.join(output_dir, MANIFEST), manifest)
+    return counts
+
+
+def export(input_path, output_dir, cache_path=MARKDOWN_CACHE, workers=None):
+    """Exports the merged output at input_path to jkan markdown files in output_dir
+
+    Datasets are read, rendered and written as a stream, so only a few
+    chunks of datasets are in memory at once.
+    The file each dataset was written to is saved in output_dir, see
+    load_index.
+
+    Args:
+        input_path (str): the merged output csv, and its parquet copy if there is one
+        output_dir (str): the jkan _datasets folder
+        cache_path (str): the markdown cache file
+        workers (int): the number of rendering processes, by default one per cpu
+
+    Returns:
+        dict: the number of files added, changed, removed and unchanged
+    """
+    cache = MarkdownCache(cache_path)
+    index = {}
+    datasets = name_datasets(iter_datasets(iter_records(input_path)), index)
+    counts = sync_datasets(render_datasets(datasets, cache, workers), output_dir)
+    write_atomic(
+        os.path.join(output_dir, INDEX), json.dumps(index, indent=0, sort_keys=True)
+    )
+    cache.save()
+    print(f"Rendered {cache.misses} new descriptions")
+    return counts
+
+
+def main():
+    counts = export("data/merged_output.csv", "../jkan/_datasets/")
+    print(
+        f"jkan datasets: {counts['added']} added, {counts['changed']} changed,"
+        f" {counts['removed']} removed, {counts['unchanged']} unchanged"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class HTTPCache:
+    """An on-disk cache of response bodies keyed by URL.
+
+    Each entry is a <sha256 of url>.body file holding the body and a
+    <sha256 of url>.json file holding the url and its ETag/Last-Modified
+    validators. Reading an entry touches its body, and once the bodies
+    add up to more than max_bytes the least recently used are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None
+        self.lock = threading.Lock()
+
+    def path(self, url, ext):
+        return os.path.join(
+            self.directory, hashlib.sha256(url.encode()).hexdigest() + ext
+        )
+
+    def validators(self, url):
+        """Gets the conditional request headers for a cached url"""
+        try:
+            with open(self.path(url, ".json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, url):
+        """Gets the cached body for url, or None if there isn't one"""
+        body_path = self.path(url, ".body")
+        try:
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(body_path)
+        except OSError:
+            return None
+        return body
+
+    def open(self, url):
+        """Opens the cached body for url as a binary file, or returns None"""
+        body_path = self.path(url, ".body")
+        try:
+            body = open(body_path, "rb")
+            os.utime(body_path)
+        except OSError:
+            return None
+        return body
+
+    def store(self, url, body, etag=None, last_modified=None):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        self.commit(url, tmp_path, len(body), etag, last_modified)
+
+    def tee(self, url, stream, etag=None, last_modified=None):
+        """Wraps stream so the body is stored for url as it is read"""
+        os.makedirs(self.directory, exist_ok=True)
+        return CachingReader(self, url, stream, etag, last_modified)
+
+    def commit(self, url, tmp_path, size, etag, last_modified):
+        entry = {"url": url, "etag": etag, "last_modified": last_modified}
+        body_path = self.path(url, ".body")
+        with self.lock:
+            # a re-fetched url replaces its old body, which no longer counts
+            try:
+                replaced = os.path.getsize(body_path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, body_path)
+            self.write(self.path(url, ".json"), json.dumps(entry).encode())
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.bodies())
+            else:
+                self.size += size - replaced
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def write(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def bodies(self):
+        """Yields (path, size, last used) for every cached body"""
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".body"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes"""
+        bodies = sorted(self.bodies(), key=lambda body: body[2])
+        self.size = sum(size for _, size, _ in bodies)
+        for body_path, size, _ in bodies:
+            if self.size <= self.max_bytes:
+                break
+            for path in (body_path, body_path[: -len(".body")] + ".json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.size -= size
+
+
+class CachingReader:
+    """A binary stream that copies everything read from it into the cache.
+
+    The entry is only stored once the stream has been read to the end, so
+    a body that is abandoned part way through never replaces a good one.
+    """
+
+    def __init__(self, cache, url, stream, etag, last_modified):
+        self.cache = cache
+        self.url = url
+        self.stream = stream
+        self.etag = etag
+        self.last_modified = last_modified
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        if chunk:
+            self.file.write(chunk)
+            self.size += len(chunk)
+        elif self.file is not None:
+            self.file.close()
+            self.file = None
+            self.cache.commit(
+                self.url, self.tmp_path, self.size, self.etag, self.last_modified
+            )
+        return chunk
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            os.remove(self.tmp_path)
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,328 @@
+from email.utils import parsedate_to_datetime
+from urllib import parse, request
+from urllib.error import HTTPError, URLError
+import csv
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from http_cache import HTTPCache
+except:
+    from .http_cache import HTTPCache
+
+
+# Statuses worth retrying: rate limited, or the server is having a moment
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """Stops requests to a host after too many consecutive failures.
+
+    Once open, requests fail immediately until cooldown seconds have passed,
+    then one request is let through to test the host. Success closes the
+    breaker again, failure re-opens it.
+    """
+
+    def __init__(self, threshold=5, cooldown=300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # half open: let this request through, others fail fast until it's done
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()
+
+
+class TokenBucket:
+    """Lets requests through at rate per second, with bursts of up to burst."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_rate_limits(fname):
+    """Reads the Requests Per Second column of sources.csv into {host: rate}.
+
+    Where sources share a host the lowest rate wins.
+    """
+    rate_limits = {}
+    with open(fname, "r", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            if not (row.get("Requests Per Second") or "").strip():
+                continue
+            host = parse.urlsplit(row["Source URL"].strip()).netloc
+            rate = float(row["Requests Per Second"])
+            rate_limits[host] = min(rate, rate_limits.get(host, rate))
+    return rate_limits
+
+
+class HTTPSession:
+    """A pooled, keep-alive HTTP client shared by all the processors.
+
+    Connections are kept open and reused per host by a requests.Session.
+    Failures are raised as urllib's HTTPError and URLError so callers can
+    handle them the same way whichever scheme the url uses. Anything other
+    than http(s), e.g. the file:// urls used by the tests, goes through
+    urllib.
+
+    Timeouts, connection errors and transient statuses are retried up to
+    retries times, backing off exponentially with full jitter or for as
+    long as a Retry-After header asks. A host that keeps failing trips its
+    CircuitBreaker so the rest of its requests fail fast. Every request,
+    retries included, waits for its host's TokenBucket, which lets through
+    rate_limits[host] requests per second, or default_rate if not listed.
+
+    With a cache, GETs send the validators of any cached copy and 304s are
+    answered from disk. In offline mode requests are only answered from the
+    cache and never touch the network.
+    """
+
+    def __init__(
+        self,
+        timeout=(10, 120),
+        pool_size=16,
+        cache=None,
+        retries=3,
+        rate_limits=None,
+        default_rate=5,
+    ):
+        # (connect, read) seconds, as accepted by requests
+        self.timeout = timeout
+        self.retries = retries
+        # seconds: the first retry waits up to backoff, doubling up to max_backoff
+        self.backoff = 1
+        self.max_backoff = 60
+        self.breakers = {}
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        self.buckets = {}
+        self.cache = cache
+        self.offline = False
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.not_modified = 0
+
+    def request(self, method, url, data=None, headers=None):
+        if not url.startswith(("http://", "https://")):
+            req = request.Request(url, data=data, headers=headers or {})
+            with request.urlopen(req, timeout=self.timeout[1]) as resp:
+                return resp.read()
+
+        cache = self.cache
+        # POSTs are cached by url and body only so they can be replayed offline
+        cache_key = url if data is None else url + "\n" + data.decode()
+        if cache is not None and self.offline:
+            body = cache.load(cache_key)
+            if body is None:
+                raise URLError("not in the HTTP cache and running offline")
+            return body
+
+        if cache is not None and method == "GET":
+            validators = cache.validators(url)
+            resp = self.send(method, url, data, {**validators, **(headers or {})})
+            if resp.status_code == 304:
+                body = cache.load(url)
+                if body is not None:
+                    with self.lock:
+                        self.not_modified += 1
+                    return body
+                # the entry was evicted since we read its validators
+                resp = self.send(method, url, data, headers)
+        else:
+            resp = self.send(method, url, data, headers)
+
+        if resp.status_code >= 400:
+            raise HTTPError(url, resp.status_code, resp.reason, resp.headers, None)
+        if cache is not None:
+            cache.store(
+                cache_key,
+                resp.content,
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+            )
+        return resp.content
+
+    def open(self, url, headers=None):
+        """Like get, but returns a binary file object the body can be read from as it arrives"""
+        if not url.startswith(("http://", "https://")):
+            return request.urlopen(
+                request.Request(url, headers=headers or {}), timeout=self.timeout[1]
+            )
+
+        cache = self.cache
+        if cache is not None and self.offline:
+            body = cache.open(url)
+            if body is None:
+                raise URLError("not in the HTTP cache and running offline")
+            return body
+
+        if cache is not None:
+            validators = cache.validators(url)
+            resp = self.send("GET", url, None, {**validators, **(headers or {})}, True)
+            if resp.status_code == 304:
+                body = cache.open(url)
+                if body is not None:
+                    resp.close()
+                    with self.lock:
+                        self.not_modified += 1
+                    return body
+                resp.close()
+                # the entry was evicted since we read its validators
+                resp = self.send("GET", url, None, headers, True)
+        else:
+            resp = self.send("GET", url, None, headers, True)
+
+        if resp.status_code >= 400:
+            resp.close()
+            raise HTTPError(url, resp.status_code, resp.reason, resp.headers, None)
+        resp.raw.decode_content = True
+        if cache is not None:
+            return cache.tee(
+                url,
+                resp.raw,
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+            )
+        return resp.raw
+
+    def send(self, method, url, data, headers, stream=False):
+        breaker = self.get_breaker(url)
+        if not breaker.allow():
+            raise URLError(f"circuit open after repeated failures from {url}")
+        bucket = self.get_bucket(url)
+
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                resp = self.session.request(
+                    method,
+                    url,
+                    data=data,
+                    headers=headers,
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+                error = None
+            except requests.RequestException as err:
+                resp = None
+                error = err
+            with self.lock:
+                self.requests += 1
+
+            transient = error is not None or resp.status_code in TRANSIENT_STATUSES
+            if not transient or attempt >= self.retries:
+                break
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+            if resp is not None:
+                delay = max(delay, self.retry_after(resp))
+            attempt += 1
+            print(f"Retrying {url} in {delay:.1f}s (attempt {attempt})")
+            time.sleep(delay)
+
+        breaker.record(not transient)
+        if error is not None:
+            raise URLError(error) from error
+        return resp
+
+    def retry_after(self, resp):
+        """Gets the seconds a Retry-After header asks for, capped at max_backoff"""
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return 0
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return 0
+        return min(max(seconds, 0), self.max_backoff)
+
+    def get_bucket(self, url):
+        host = parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                rate = self.rate_limits.get(host, self.default_rate)
+                self.buckets[host] = TokenBucket(rate)
+            return self.buckets[host]
+
+    def get_breaker(self, url):
+        host = parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker()
+            return self.breakers[host]
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def post(self, url, data, headers=None):
+        return self.request("POST", url, data=data, headers=headers)
+
+    def stats(self):
+        """Counts the connections opened and reused across all hosts"""
+        pools = self.adapter.poolmanager.pools
+        opened = sum(pools[key].num_connections for key in pools.keys())
+        return {
+            "requests": self.requests,
+            "opened": opened,
+            "reused": self.requests - opened,
+            "not_modified": self.not_modified,
+        }
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT_DIR, "cache", "http")
+
+session = HTTPSession(
+    cache=HTTPCache(CACHE_DIR),
+    rate_limits=load_rate_limits(os.path.join(ROOT_DIR, "sources.csv")),
+)
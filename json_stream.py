@@ -0,0 +1,94 @@
+import codecs
+import json
+
+
+class JSONStreamReader:
+    """Decodes JSON values one at a time from a binary stream.
+
+    Only as much of the stream is read and held in memory as is needed to
+    decode the next value.
+    """
+
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads another chunk into the buffer, returning False at the end of the stream"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos :] + self.decoder.decode(
+            chunk, final=not chunk
+        )
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return True
+
+    def next_char(self):
+        """Skips whitespace and returns the next character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("unexpected end of JSON stream")
+
+    def expect(self, chars):
+        char = self.next_char()
+        if char not in chars:
+            raise ValueError(f"expected one of {chars!r} but found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may carry on in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_items(stream, key):
+    """Yields the items of the array under key in the top-level JSON object in stream.
+
+    Items are decoded and yielded as they arrive, so memory use is bounded
+    by the largest item rather than the whole document. Yields nothing if
+    the object has no such key.
+    """
+    reader = JSONStreamReader(stream)
+    reader.expect("{")
+    if reader.next_char() != "}":
+        while True:
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                reader.expect("[")
+                if reader.next_char() == "]":
+                    reader.pos += 1
+                else:
+                    while True:
+                        yield reader.value()
+                        if reader.expect(",]") == "]":
+                            break
+            else:
+                reader.value()
+            if reader.expect(",}") == "}":
+                break
+    # read to the end, so anything watching the stream (e.g. a CachingReader) sees all of it
+    while reader.fill():
+        pass
@@ -1,127 +1,111 @@
 ### Setting the environment
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import numpy as np
 import pandas as pd
+import json
 import os
-import datetime as dt
+
+try:
+    from dates import normalise_date
+    from records import CatalogueRecord, MERGED_FIELDS
+    import columnar
+except:
+    from .dates import normalise_date
+    from .records import CatalogueRecord, MERGED_FIELDS
+    from . import columnar
+
+
+ODS_CATEGORIES_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "ods_categories.json"
+)
+
+# every column is read as a string, so pandas doesn't infer types file by file
+SOURCE_DTYPES = dict.fromkeys(CatalogueRecord._fields, str)
+
+SCOTGOV_COLUMNS = {
+    "title": "Title",
+    "category": "OriginalTags",
+    "organization": "Owner",
+    "notes": "Description",
+    "date_created": "DateCreated",
+    "date_updated": "DateUpdated",
+    "url": "PageURL",
+    "licence": "License",
+}
+
+
+def read_source(fname, **kwargs):
+    """Reads one source's output as strings, from its parquet copy if it has one
+
+    Dates are read as they were written and normalised once, in clean_data.
+    """
+    dataframe = columnar.read_frame(fname)
+    if dataframe is None:
+        dataframe = pd.read_csv(fname, dtype=SOURCE_DTYPES, **kwargs)
+    return dataframe
+
+
+def read_scotgov(fname):
+    """Reads the sparql query's output, renaming its columns to match the others"""
+    dataframe = pd.read_csv(fname, dtype=dict.fromkeys(SCOTGOV_COLUMNS, str))
+    return dataframe.rename(columns=SCOTGOV_COLUMNS)
+
+
+### Where each source's data is, in the order they're merged: (file or folder of csvs, Source, reader)
+SOURCES = [
+    ("data/ckan/", "ckan API", partial(read_source, lineterminator="\n")),
+    ("data/arcgis/", "arcgis API", read_source),
+    ("data/USMART/", "USMART API", read_source),
+    ("data/scotgov-datasets-sparkql.csv", "sparql", read_scotgov),
+    ("data/dcat/", "DCAT feed", read_source),
+    ("data/scraped-results/", "Web Scraped", read_source),
+]
+
+
+def find_source_files(sources):
+    """Lists (csv file, Source, reader) for every csv of every source"""
+    files = []
+    for path, source, reader in sources:
+        if os.path.isfile(path):
+            files.append((path, source, reader))
+            continue
+        for dirname, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".csv"):
+                    files.append((os.path.join(dirname, filename), source, reader))
+    return files
+
+
+def load_sources(sources, workers=8):
+    """Reads every source's csvs in parallel and concatenates them, once
+
+    Args:
+        sources (list): (file or folder of csvs, Source, reader) for each source
+        workers (int): the number of files to read at once
+
+    Returns:
+        dataframe: every source's rows, labelled with their Source
+    """
+    files = find_source_files(sources)
+
+    def read(file):
+        fname, source, reader = file
+        return reader(fname).assign(Source=source)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(read, files))
+    for (fname, source, _), frame in zip(files, frames):
+        print(f"{source}: {len(frame)} rows from {fname}")
+    if not frames:
+        return pd.DataFrame(columns=list(CatalogueRecord._fields) + ["Source"])
+    return pd.concat(frames, ignore_index=True)
 
 
 def merge_data():
-    ### Loading data
-
-    ### From ckan output
-    source_ckan = pd.DataFrame()
-    folder = "data/ckan/"
-    for dirname, _, filenames in os.walk(folder):
-        for filename in filenames:
-            if filename.rsplit(".", 1)[1] == "csv":
-                print(filename)
-                source_ckan = pd.concat(
-                    [
-                        source_ckan,
-                        pd.read_csv(
-                            folder + r"/" + filename, parse_dates=["DateCreated","DateUpdated"], lineterminator='\n'
-                        ),
-                    ]
-                )
-    source_ckan["Source"] = "ckan API"
-
-    ### From scotgov csv
-    source_scotgov = pd.read_csv("data/scotgov-datasets-sparkql.csv")
-    source_scotgov = source_scotgov.rename(
-        columns={
-            "title": "Title",
-            "category": "OriginalTags",
-            "organization": "Owner",
-            "notes": "Description",
-            "date_created": "DateCreated",
-            "date_updated": "DateUpdated",
-            "url": "PageURL",
-            "licence":"License"
-        }
-    )
-    source_scotgov["Source"] = "sparql"
-    source_scotgov['DateUpdated'] = pd.to_datetime(source_scotgov['DateUpdated'], utc=True).dt.tz_localize(None)
-    source_scotgov['DateCreated'] = pd.to_datetime(source_scotgov['DateCreated'], utc=True).dt.tz_localize(None)
-
-    ### From arcgis api
-    source_arcgis = pd.DataFrame()
-    folder = "data/arcgis/"
-    for dirname, _, filenames in os.walk(folder):
-        for filename in filenames:
-            if filename.rsplit(".", 1)[1] == "csv":
-                source_arcgis = pd.concat(
-                    [
-                        source_arcgis,
-                        pd.read_csv(
-                            folder + r"/" + filename, parse_dates=["DateCreated","DateUpdated"]
-                        ),
-                    ]
-                )
-    source_arcgis["Source"] = "arcgis API"
-
-    ### From usmart api
-    source_usmart = pd.DataFrame()
-    folder = "data/USMART/"
-    for dirname, _, filenames in os.walk(folder):
-        for filename in filenames:
-            if filename.rsplit(".", 1)[1] == "csv":
-                source_usmart = pd.concat(
-                    [
-                        source_usmart,
-                        pd.read_csv(
-                            folder + r"/" + filename, parse_dates=["DateCreated","DateUpdated"]
-                        ),
-                    ]
-                )
-    source_usmart["Source"] = "USMART API"
-    source_usmart["DateUpdated"] = source_usmart["DateUpdated"].dt.tz_localize(None)
-    source_usmart["DateCreated"] = source_usmart["DateCreated"].dt.tz_localize(None)
-
-    ## From DCAT
-    source_dcat = pd.DataFrame()
-    folder = "data/dcat/"
-    for dirname, _, filenames in os.walk(folder):
-        for filename in filenames:
-            if filename.rsplit(".", 1)[1] == "csv":
-                source_dcat = pd.concat(
-                    [
-                        source_dcat,
-                        pd.read_csv(
-                            folder + r"/" + filename, parse_dates=["DateCreated","DateUpdated"]
-                        ),
-                    ]
-                )
-    source_dcat["DateUpdated"] =  source_dcat["DateUpdated"].dt.tz_localize(None)
-    #source_dcat["DateCreated"] = source_dcat["DateCreated"].dt.tz_localize(None) ### DateCreated currently not picked up in dcat so all are NULL
-    source_dcat["Source"] = "DCAT feed"
-
-    ## From web scraped results
-    source_scraped = pd.DataFrame()
-    folder = "data/scraped-results/"
-    for dirname, _, filenames in os.walk(folder):
-        for filename in filenames:
-            if filename.rsplit(".", 1)[1] == "csv":
-                source_scraped = pd.concat(
-                    [
-                        source_scraped,
-                        pd.read_csv(
-                            folder + r"/" + filename, parse_dates=["DateCreated","DateUpdated"]
-                        ),
-                    ]
-                )
-    source_scraped["Source"] = "Web Scraped"
-
-    ### Combine all data into single table
-    data = pd.concat(
-        [
-            source_ckan,
-            source_arcgis,
-            source_usmart,
-            source_scotgov,
-            source_dcat,
-            source_scraped,
-        ]
-    )
-    data = data.reset_index(drop=True)
+    ### Loading data, from every source at once
+    data = load_sources(SOURCES)
 
     ### Saves copy of data without cleaning - for analysis purposes
     data.to_csv("data/merged_output_untidy.csv", index=False)
@@ -129,12 +113,243 @@ def merge_data():
     ### clean data
     data = clean_data(data)
 
-    ### Output cleaned data to csv
+    ### Output cleaned data to csv, with the columns export2jkan.py reads as MergedRecords,
+    ### sorted so each dataset's rows are together and export2jkan.py can stream them
+    data = data[list(MERGED_FIELDS)].sort_values(["PageURL", "Title"], kind="stable")
     data.to_csv("data/merged_output.csv", index=False)
+    if columnar.available:
+        columnar.write_frame(data, columnar.parquet_fname("data/merged_output.csv"))
 
     return data
 
 
+def normalise_dates(column):
+    """Normalises a column of dates to YYYY-MM-DD strings, parsing each distinct value once
+
+    Args:
+        column (pd.Series): the dates, as read from the source csvs
+
+    Returns:
+        np.ndarray: the normalised dates, "" where missing or unreadable
+    """
+    return map_unique(column, normalise_date)
+
+
+def split_tags(column):
+    """Splits a column of ";" separated tags into one row per tag
+
+    Args:
+        column (pd.Series): strings of tags
+
+    Returns:
+        pd.Series: the tags, indexed by the position of the row they came from
+    """
+    return pd.Series(column.to_numpy(), dtype=object).str.split(";").explode()
+
+
+def join_tags(tags, length):
+    """Joins the tags from split_tags back into a ";" separated string per row
+
+    Args:
+        tags (pd.Series): the tags, indexed by the position of their row
+        length (int): the number of rows, rows without tags are ""
+
+    Returns:
+        np.ndarray: the tag strings for each row
+    """
+    # concatenating "tag;"s then dropping the last ";" is much faster than agg(";".join)
+    joined = (tags.astype(object) + ";").groupby(level=0, sort=True).sum().str[:-1]
+    return joined.reindex(range(length), fill_value="").to_numpy()
+
+
+def tidy_categories(categories):
+    """tidies a column of categories: removes commas, strips whitespace, converts all to lower and strips any trailing ";"
+
+    Args:
+        categories (pd.Series): the dataset categories as strings
+
+    Returns:
+        np.ndarray: the tidied categories for each row
+    """
+    # missing categories are "nan", as str() would make them
+    categories = categories.astype(object).where(categories.notna(), "nan")
+    categories = categories.astype(str)
+    tags = split_tags(categories.str.replace(",", ";", regex=False))
+    tags = tags[tags != ""].str.lower().str.strip()
+    tags = tags[tags != "nan"]
+    tidied = pd.Series(join_tags(tags, len(categories)), dtype=object)
+    return tidied.str.removesuffix(";").to_numpy()
+
+
+def combine_categories(original_tags, manual_tags):
+    """Combine tidied OriginalTags and ManualTags to get all tags, without repeats
+
+    Tags are kept in the order they first appear, original tags first.
+
+    Args:
+        original_tags (pd.Series): the tidied OriginalTags
+        manual_tags (pd.Series): the tidied ManualTags
+
+    Returns:
+        np.ndarray: the combined tags for each row
+    """
+    combined = original_tags.astype(object) + ";" + manual_tags.astype(object)
+    tags = split_tags(combined)
+    repeats = pd.DataFrame({"row": tags.index, "tag": tags.to_numpy()}).duplicated()
+    return join_tags(tags[~repeats.to_numpy()], len(combined))
+
+
+def load_ODScategories(fname=ODS_CATEGORIES_FILE):
+    """Loads the ODS categories into an index of the categories for each dataset tag
+
+    Args:
+        fname (str): a json file of each ODS category's tags
+
+    Returns:
+        dict: the sorted tuple of categories for each tag
+    """
+    with open(fname, "r", encoding="utf-8") as f:
+        ods_categories = json.load(f)
+    index = {}
+    for category, tags in ods_categories.items():
+        for tag in tags:
+            index.setdefault(tag, set()).add(category)
+    return {tag: tuple(sorted(categories)) for tag, categories in index.items()}
+
+
+def assign_ODScategories(combined_tags, index):
+    """Assigns ODS' categories to each row from its tags, or 'Uncategorised' if none.
+
+    Args:
+        combined_tags (pd.Series): the tidied tags of each dataset
+        index (dict): the categories for each tag, from load_ODScategories
+
+    Returns:
+        np.ndarray: the ";" separated categories for each row, in alphabetical order
+    """
+    categories = split_tags(combined_tags).map(index).dropna().explode()
+    categories = pd.DataFrame(
+        {"row": categories.index, "category": categories.to_numpy()}
+    )
+    categories = categories.drop_duplicates().sort_values(["row", "category"])
+    categories = pd.Series(categories["category"].to_numpy(), index=categories["row"])
+    assigned = pd.Series(join_tags(categories, len(combined_tags)), dtype=object)
+    return assigned.where(assigned != "", "Uncategorised").to_numpy()
+
+
+### Licence names, to match export2jkan -- FOR ANALYTICS ONLY, will discard in 2022Q2 Milestone
+KNOWN_LICENCES = {
+    "https://creativecommons.org/licenses/by-sa/3.0/": "Creative Commons Attribution Share-Alike 3.0",
+    "https://creativecommons.org/licenses/by/4.0/legalcode": "Creative Commons Attribution 4.0 International",
+    "https://creativecommons.org/licenses/by/4.0": "Creative Commons Attribution 4.0 International",
+    "Creative Commons Attribution 4.0": "Creative Commons Attribution 4.0 International",
+    "https://creativecommons.org/share-your-work/public-domain/cc0": "Creative Commons CC0",
+    "https://rightsstatements.org/page/NoC-NC/1.0/": "Non-Commercial Use Only",
+    "https://opendatacommons.org/licenses/odbl/1-0/": "Open Data Commons Open Database License 1.0",
+    "Open Data Commons Open Database License 1.0": "Open Data Commons Open Database License 1.0",
+    "https://www.nationalarchives.gov.uk/doc/open-government-licence/version/2/": "Open Government Licence v2.0",
+    "https://www.nationalarchives.gov.uk/doc/open-government-licence/version/3/": "Open Government Licence v3.0",
+    "Open Government Licence 3.0 (United Kingdom)": "Open Government Licence v3.0",
+    "UK Open Government Licence (OGL)": "Open Government Licence v3.0",
+    "Open Government": "Open Government Licence v3.0",
+    "uk-ogl": "Open Government Licence v3.0",
+    "OGL3": "Open Government Licence v3.0",
+    "https://rightsstatements.org/vocab/NKC/1.0/": "No Known Copyright",
+    "https://creativecommons.org/publicdomain/mark/1.0/": "Public Domain",
+    "Other (Public Domain)": "Public Domain",
+    "Public Domain": "Public Domain",
+    "Public Sector End User Licence (Scotland)": "Public Sector End User Licence (Scotland)",
+}
+
+### Licences by their name lowercased and stripped of " /", the first match in KNOWN_LICENCES wins
+LICENCE_LOOKUP = {}
+for key, licence in KNOWN_LICENCES.items():
+    LICENCE_LOOKUP.setdefault(key.lower().strip(" /"), licence)
+
+### Temporary data type conversion
+FILE_TYPES_TO_TIDY = {
+    "application/x-7z-compressed": "7-Zip compressed file",
+    "ArcGIS GeoServices REST API": "ARCGIS GEOSERVICE",
+    "Esri REST": "ARCGIS GEOSERVICE",
+    "Atom Feed": "ATOM FEED",
+    "htm": "HTML",
+    "ics": "iCalendar",
+    "jpeg": "Image",
+    "vnd.openxmlformats-officedocument.spreadsheetml.sheet": "MS EXCEL",
+    "vnd.ms-excel": "MS EXCEL",
+    "xls": "MS EXCEL",
+    "xlsx": "MS EXCEL",
+    "doc": "MS Word",
+    "docx": "MS Word",
+    "QGIS": "QGIS Shapefile",
+    "text": "TXT",
+    "web": "URL",
+    "UK/DATA/#TABGB1900": "URL",
+    "UK/ROY/GAZETTEER/#DOWNLOAD": "URL",
+    "Web Mapping Application": "WEB MAP",
+    "mets": "XML",
+    "alto": "XML",
+}
+
+### File types by their name lowercased and stripped of ". /", the first match in FILE_TYPES_TO_TIDY wins
+FILE_TYPE_LOOKUP = {}
+for key, file_type in FILE_TYPES_TO_TIDY.items():
+    FILE_TYPE_LOOKUP.setdefault(key.lower().strip(". /"), file_type)
+
+
+def map_unique(column, function):
+    """Applies function once to each distinct value of a column, rather than to every row
+
+    Args:
+        column (pd.Series): the values
+        function (callable): the function to apply to them
+
+    Returns:
+        np.ndarray: the result for each row
+    """
+    # missing values get the code -1, so their result goes last
+    codes, uniques = pd.factorize(column)
+    results = [function(value) for value in uniques] + [function(np.nan)]
+    return np.array(results, dtype=object)[codes]
+
+
+@lru_cache(maxsize=None)
+def tidy_licence(licence_name):
+    """Temporary licence conversion to match export2jkan -- FOR ANALYTICS ONLY, will discard in 2022Q2 Milestone
+    Returns:
+        string: a tidied licence name
+    """
+    tidied_licence = LICENCE_LOOKUP.get(str(licence_name).lower().strip(" /"))
+    if tidied_licence is not None:
+        return tidied_licence
+
+    if str(licence_name) == "nan":
+        tidied_licence = "No licence"
+    else:
+        tidied_licence = "Custom licence: " + str(licence_name)
+    return tidied_licence
+
+
+@lru_cache(maxsize=None)
+def tidy_file_type(file_type):
+    """ Temporary data type conversion
+    Args:
+        file_type (str): the data type name
+    Returns:
+        tidied_file_type (str): a tidied data type name
+    """
+    tidied_file_type = FILE_TYPE_LOOKUP.get(str(file_type).lower().strip(". /"))
+    if tidied_file_type is not None:
+        return tidied_file_type
+
+    if str(file_type) == "nan" or str(file_type) == "":
+        tidied_file_type = "No file type"
+    else:
+        tidied_file_type = str(file_type).strip(". /").upper()
+
+    return tidied_file_type
+
+
 def clean_data(dataframe):
     """cleans data in a dataframe
 
@@ -163,567 +378,29 @@ def clean_data(dataframe):
         "Na h-Eileanan an Iar": "Comhairle nan Eilean Siar",
     }
     data["Owner"] = data["Owner"].replace(owner_renames)
-    ### Format dates as datetime type
-    data["DateCreated"] = pd.to_datetime(
-        data["DateCreated"], format="%Y-%m-%d", errors="coerce", utc=True
-    ).dt.date
-    data["DateUpdated"] = pd.to_datetime(
-        data["DateUpdated"], format="%Y-%m-%d", errors="coerce", utc=True
-    ).dt.date
+    ### Format dates as YYYY-MM-DD
+    data["DateCreated"] = normalise_dates(data["DateCreated"])
+    data["DateUpdated"] = normalise_dates(data["DateUpdated"])
     ### Inconsistencies in casing for FileType
     data["FileType"] = data["FileType"].str.upper()
     ### Creating a dummy column
     data["AssetStatus"] = None
 
-    ### Cleaning dataset categories
-    def tidy_categories(categories_string):
-        """tidies the categories: removes commas, strips whitespace, converts all to lower and strips any trailing ";"
-
-        Args:
-            categories_string (string): the dataset categories as a string
-        """
-        tidied_string = str(categories_string).replace(",", ";")
-        tidied_list = [
-            cat.lower().strip() for cat in tidied_string.split(";") if cat != ""
-        ]
-        tidied_string = ";".join(str(cat) for cat in tidied_list if str(cat) != "nan")
-        if len(tidied_string) > 0:
-            if tidied_string[-1] == ";":
-                tidied_string = tidied_string[:-1]
-        return tidied_string
-
-    ### Combining dataset categories
-    def combine_categories(dataset_row):
-        """Combine OriginalTags and ManualTags to get all tags
-
-        Args:
-            dataset_row (dataframe): one row of the dataset set
-        """
-        combined_tags = []
-        if str(dataset_row["OriginalTags"]) != "nan":
-            combined_tags = combined_tags + str(dataset_row["OriginalTags"]).split(";")
-        if str(dataset_row["ManualTags"]) != "nan":
-            combined_tags = combined_tags + str(dataset_row["ManualTags"]).split(";")
-
-        combined_tags = ";".join(str(cat) for cat in set(combined_tags))
-        return combined_tags
-
-    data["OriginalTags"] = data["OriginalTags"].apply(tidy_categories)
-    data["ManualTags"] = data["ManualTags"].apply(tidy_categories)
-    data["CombinedTags"] = data.apply(lambda x: combine_categories(x), axis=1)
+    ### Cleaning and combining dataset categories
+    data["OriginalTags"] = tidy_categories(data["OriginalTags"])
+    data["ManualTags"] = tidy_categories(data["ManualTags"])
+    data["CombinedTags"] = combine_categories(data["OriginalTags"], data["ManualTags"])
 
     ### Creating new dataset categories for ODS
-    def assign_ODScategories(categories_string):
-        """Assigns one of ODS' 13 categories, or 'Uncategorised' if none.
-
-        Args:
-            categories_string (string): the dataset categories as a string
-        """
-        combined_tags = categories_string.split(";")
-
-        ### Set association between dataset tag and ODS category
-        ods_categories = {
-            "Arts / Culture / History": [
-                "arts",
-                "culture",
-                "history",
-                "military",
-                "art gallery",
-                "design",
-                "fashion",
-                "museum",
-                "historic centre",
-                "conservation",
-                "archaeology",
-                "events",
-                "theatre",
-            ],
-            "Budget / Finance": [
-                "tenders",
-                "contracts",
-                "lgcs finance",
-                "budget",
-                "finance",
-                "payment",
-                "grants",
-                "financial year",
-                "council tax",
-            ],
-            "Business and Economy": [
-                "business and economy",
-                "business",
-                "business and trade",
-                "economic information",
-                "economic development",
-                "business grants",
-                "business awards",
-                "health and safety",
-                "trading standards",
-                "food safety",
-                "business rates",
-                "commercial land and property" "commercial waste",
-                "pollution",
-                "farming",
-                "forestry",
-                "crofting",
-                "countryside",
-                "farming",
-                "emergency planning",
-                "health and safety",
-                "trading standards",
-                "health and safety at work",
-                "regeneration",
-                "shopping",
-                "shopping centres",
-                "markets",
-                "tenders",
-                "contracts",
-                "city centre management",
-                "town centre management",
-                "economy",
-                "economic",
-                "economic activity",
-                "economic development",
-                "deprivation",
-                "scottish index of multiple deprivation",
-                "simd",
-                "business",
-                "estimated population",
-                "population",
-                "labour force",
-            ],
-            "Council and Government": [
-                "council buildings",
-                "community development",
-                "council and government",
-                "council",
-                "councils",
-                "council tax",
-                "benefits",
-                "council grants",
-                "grants",
-                "council departments",
-                "data protection",
-                "FOI",
-                "freedom of information",
-                "council housing",
-                "politicians",
-                "MPs",
-                "MSPs",
-                "councillors",
-                "elected members",
-                "wards",
-                "constituencies",
-                "boundaries",
-                "council minutes",
-                "council agendas",
-                "council plans",
-                "council policies",
-            ],
-            "Education": [
-                "primary schools",
-                "lgcs education & skills",
-                "education",
-                "eductional",
-                "library",
-                "school meals",
-                "schools",
-                "school",
-                "nurseries",
-                "playgroups",
-            ],
-            "Elections / Politics": [
-                "community councils",
-                "political",
-                "polling places",
-                "elections",
-                "politics",
-                "elecorate",
-                "election",
-                "electoral",
-                "electorate",
-                "local authority",
-                "council area",
-                "democracy",
-                "polling",
-                "lgcs democracy",
-                "democracy and governance",
-                "local government",
-                "councillor",
-                "councillors",
-                "community council",
-            ],
-            "Food and Environment": [
-                "food",
-                "school meals",
-                "allotment",
-                "public toilets",
-                "air",
-                "tree",
-                "vacant and derelict land supply",
-                "landscape",
-                "nature",
-                "rights of way",
-                "tree preservation order",
-                "preservation",
-                "land",
-                "contaminated",
-                "green",
-                "belt",
-                "employment land audit",
-                "environment",
-                "forest woodland strategy",
-                "waste",
-                "recycling",
-                "lgcs waste management",
-                "water-network",
-                "grafitti",
-                "street occupations",
-                "regeneration",
-                "vandalism",
-                "street cleansing",
-                "litter",
-                "toilets",
-                "drains",
-                "flytipping",
-                "flyposting",
-                "pollution",
-                "air quality",
-                "household waste",
-                "commercial waste",
-            ],
-            "Health and Social Care": [
-                "public toilets",
-                "contraception",
-                "implant",
-                "cervical",
-                "iud",
-                "ius",
-                "pis",
-                "prescribing",
-                "elderly",
-                "screening",
-                "screening programme",
-                "cancer",
-                "breast feeding",
-                "defibrillators",
-                "wards",
-                "alcohol and drug partnership",
-                "care homes",
-                "waiting times",
-                "drugs",
-                "substance use",
-                "pregnancy",
-                "induced abortion",
-                "therapeutic abortion",
-                "termination",
-                "abortion",
-                "co-dependency",
-                "sexual health",
-                "outpatient",
-                "waiting list",
-                "stage of treatment",
-                "daycase",
-                "inpatient",
-                "alcohol",
-                "waiting time",
-                "treatment",
-                "community wellbeing and social environment",
-                "health",
-                "human services",
-                "covid-19",
-                "covid",
-                "hospital",
-                "health board",
-                "health and social care partnership",
-                "medicine",
-                "health and social care",
-                "health and fitness",
-                "nhs24",
-                "hospital admissions",
-                "hospital mortality",
-                "mental health",
-                "pharmacy",
-                "GP",
-                "surgery",
-                "fostering",
-                "adoption",
-                "social work",
-                "asylum",
-                "immigration",
-                "citizenship",
-                "carers",
-            ],
-            "Housing and Estates": [
-                "buildings",
-                "housing data supply 2020",
-                "multiple occupation",
-                "housing",
-                "sheltered housing",
-                "adaptations",
-                "repairs",
-                "council housing",
-                "landlord",
-                "landlord registration",
-                "rent arrears",
-                "parking",
-                "garages",
-                "homelessness",
-                "temporary accommodation",
-                "rent",
-                "tenancy",
-                "housing advice",
-                "housing associations",
-                "housing advice",
-                "housing repairs",
-                "lettings",
-                "real estate",
-                "land records",
-                "land-cover",
-                "woodland",
-                "dwellings",
-                "burial grounds",
-                "cemeteries",
-                "property",
-                "vacant and derelict land",
-                "scottish vacant and derelict land",
-                "allotment",
-            ],
-            "Law and Licensing": [
-                "law",
-                "licensing",
-                "regulation",
-                "regulations",
-                "licence",
-                "licenses",
-                "permit",
-                "permits",
-                "police",
-                "court",
-                "courts",
-                "tribunal",
-                "tribunals",
-            ],
-            "Parks / Recreation": [
-                "parks",
-                "recreation",
-                "woodland",
-                "parks and open spaces",
-            ],
-            "Planning and Development": [
-                "buildings",
-                "vacant and derelict land supply",
-                "core paths. adopted",
-                "employment land audit",
-                "built environment",
-                "planning",
-                "zoning",
-                "council area",
-                "address",
-                "addresses",
-                "city development plan",
-                "boundaries",
-                "post-code",
-                "dwellings",
-                "planning permission",
-                "postcode-units",
-                "housing",
-                "property",
-                "building control",
-                "conservation",
-            ],
-            "Public Safety": [
-                "emergency planning",
-                "public safety",
-                "crime and justice",
-                "lgcs community safety",
-                "street lighting",
-                "community safety",
-                "cctv",
-                "road safety",
-            ],
-            "Sport and Leisure": [
-                "sport",
-                "sports",
-                "sports facilities",
-                " sports activities",
-                "countryside",
-                "wildlife",
-                "leisure",
-                "leisure clubs",
-                "clubs",
-                "groups",
-                "societies",
-                "libraries",
-                "archives",
-                "local history",
-                "heritage",
-                "museums",
-                "galleries",
-                "parks",
-                "gardens",
-                "open spaces",
-                "sports",
-                "sports clubs",
-                "leisure centres",
-            ],
-            "Tourism": [
-                "public toilets",
-                "tourism",
-                "tourist",
-                "attractions",
-                "accomodation",
-                "historic buildings",
-                "tourist routes",
-                "cafes",
-                "restaurants",
-                "hotels",
-                "hotel",
-            ],
-            "Transportation": [
-                "core paths. adopted",
-                "lgcs transport infrastructure",
-                "transportation",
-                "mobility",
-                "pedestrian",
-                "walking",
-                "walk",
-                "cycle",
-                "cycling",
-                "parking",
-                "car",
-                "bus",
-                "tram",
-                "train",
-                "taxi",
-                "transport",
-                "electric vehicle",
-                "electric vehicle charging points",
-                "transport / mobility",
-                "active travel",
-                "road safety",
-                "roads",
-                "community transport",
-                "road works",
-                "road closures",
-                "speed limits",
-                "port",
-                "harbour",
-            ],
-        }
-
-        ### Return ODS if tag is a match
-        applied_category = []
-        for tag in combined_tags:
-            for cat in ods_categories:
-                if tag in ods_categories[cat]:
-                    applied_category = applied_category + [cat]
-
-        ### If no match, assign "Uncategorised". Tidy list of ODS categories into string.
-        if len(applied_category) == 0:
-            applied_category = ["Uncategorised"]
-
-        applied_category = ";".join(str(cat) for cat in set(applied_category))
-        applied_category
-
-        return applied_category
-
-    ### Apply ODS categorisation
-    data["ODSCategories"] = data["CombinedTags"].apply(assign_ODScategories)
-
+    data["ODSCategories"] = assign_ODScategories(
+        data["CombinedTags"], load_ODScategories()
+    )
 
     ### Tidy licence names
-    def tidy_licence(licence_name):
-        """Temporary licence conversion to match export2jkan -- FOR ANALYTICS ONLY, will discard in 2022Q2 Milestone
-        Returns:
-            string: a tidied licence name
-        """
-        known_licences = {
-            "https://creativecommons.org/licenses/by-sa/3.0/": "Creative Commons Attribution Share-Alike 3.0",
-            "https://creativecommons.org/licenses/by/4.0/legalcode": "Creative Commons Attribution 4.0 International",
-            "https://creativecommons.org/licenses/by/4.0": "Creative Commons Attribution 4.0 International",
-            "Creative Commons Attribution 4.0": "Creative Commons Attribution 4.0 International",
-            "https://creativecommons.org/share-your-work/public-domain/cc0": "Creative Commons CC0",
-            "https://rightsstatements.org/page/NoC-NC/1.0/": "Non-Commercial Use Only",
-            "https://opendatacommons.org/licenses/odbl/1-0/": "Open Data Commons Open Database License 1.0",
-            "Open Data Commons Open Database License 1.0": "Open Data Commons Open Database License 1.0",
-            "https://www.nationalarchives.gov.uk/doc/open-government-licence/version/2/": "Open Government Licence v2.0",
-            "https://www.nationalarchives.gov.uk/doc/open-government-licence/version/3/": "Open Government Licence v3.0",
-            "Open Government Licence 3.0 (United Kingdom)": "Open Government Licence v3.0",
-            "UK Open Government Licence (OGL)": "Open Government Licence v3.0",
-            "Open Government": "Open Government Licence v3.0",
-            "uk-ogl": "Open Government Licence v3.0",
-            "OGL3": "Open Government Licence v3.0",
-            "https://rightsstatements.org/vocab/NKC/1.0/": "No Known Copyright",
-            "https://creativecommons.org/publicdomain/mark/1.0/": "Public Domain",
-            "Other (Public Domain)": "Public Domain",
-            "Public Domain": "Public Domain",
-            "Public Sector End User Licence (Scotland)": "Public Sector End User Licence (Scotland)",
-        }
-
-        for key in known_licences.keys():
-            if str(licence_name).lower().strip(" /") == key.lower().strip(" /"):
-                return known_licences[key]
-
-        if str(licence_name) == "nan":
-                tidied_licence = "No licence"
-        else:
-                tidied_licence = "Custom licence: " + str(licence_name)
-        return tidied_licence
-
-    data["License"] = data["License"].apply(tidy_licence)
-
-
-    def tidy_file_type(file_type):
-        """ Temporary data type conversion
-        Args:
-            file_type (str): the data type name
-        Returns:
-            tidied_file_type (str): a tidied data type name
-        """
-        file_types_to_tidy = {
-            "application/x-7z-compressed": "7-Zip compressed file",
-            "ArcGIS GeoServices REST API": "ARCGIS GEOSERVICE",
-            "Esri REST": "ARCGIS GEOSERVICE",
-            "Atom Feed": "ATOM FEED",
-            "htm": "HTML",
-            "ics": "iCalendar",
-            "jpeg": "Image",
-            "vnd.openxmlformats-officedocument.spreadsheetml.sheet": "MS EXCEL",
-            "vnd.ms-excel": "MS EXCEL",
-            "xls": "MS EXCEL",
-            "xlsx": "MS EXCEL",
-            "doc": "MS Word",
-            "docx": "MS Word",
-            "QGIS": "QGIS Shapefile",
-            "text": "TXT",
-            "web": "URL",
-            "UK/DATA/#TABGB1900": "URL",
-            "UK/ROY/GAZETTEER/#DOWNLOAD": "URL",
-            "Web Mapping Application": "WEB MAP",
-            "mets": "XML",
-            "alto": "XML",
-        }
-        tidied_data_type = "NULL"
-
-        for key in file_types_to_tidy.keys():
-            if str(file_type).lower().strip(". /") == key.lower().strip(". /"):
-                tidied_file_type = file_types_to_tidy[key]
-                return tidied_file_type
-
-        if (
-            str(file_type) == "nan"
-            or str(file_type) == ""
-        ):
-            tidied_file_type = "No file type"
-        else:
-            # print("file type: ", file_type)
-            tidied_file_type = str(file_type).strip(". /").upper()
+    data["License"] = map_unique(data["License"], tidy_licence)
 
-        return tidied_file_type
-
-    ### Inconsistencies in casing for FileType
-    data['FileType'] = data['FileType'].apply(tidy_file_type)
+    ### Tidy file types
+    data["FileType"] = map_unique(data["FileType"], tidy_file_type)
 
     return data
 
@@ -0,0 +1,187 @@
+"""Runs the whole pipeline, replacing the serial steps in main.sh.
+
+Every source is fetched at the same time, each in its own python process,
+then merge_data.py and export2jkan.py run once the fetches are done.
+To run, in terminal: python pipeline.py
+"""
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import List
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    cwd: str = "."
+    # stages that must succeed before this one runs
+    after: List[str] = field(default_factory=list)
+    # stages that must finish, successfully or not, before this one runs
+    waits_for: List[str] = field(default_factory=list)
+    # whether the script accepts the Processor.main arguments, e.g. --offline
+    processor: bool = False
+
+
+FETCH_STAGES = [
+    Stage("arcgis", "arcgis.py", processor=True),
+    Stage("usmart", "usmart.py", processor=True),
+    Stage("ckan", "ckan.py", processor=True),
+    Stage("sparkql", "sparkql_statistics.py", processor=True),
+    Stage("dcat", "dcat.py", processor=True),
+    Stage("aberdeenshire", "aberdeenshire_council_scraper.py", cwd="web-scrapers"),
+    Stage("east_ayrshire", "east_ayrshire_scraper.py", cwd="web-scrapers"),
+    Stage("moray", "moray_council_scraper.py", cwd="web-scrapers"),
+    Stage("nls", "nls_scraper.py", cwd="web-scrapers"),
+]
+
+STAGES = FETCH_STAGES + [
+    # a source that fails to fetch shouldn't stop the rest of the catalogue updating
+    Stage("merge_data", "merge_data.py", waits_for=[s.name for s in FETCH_STAGES]),
+    Stage("export2jkan", "export2jkan.py", after=["merge_data"]),
+]
+
+
+def reset_outputs():
+    """Starts a new error log and clears the previous run's source outputs"""
+    with open("log.md", "w") as f:
+        f.write("# pipeline error log\n\n")
+        f.write("## Unaccessible Webpages\n\n")
+        f.write("|URL | Error Code | Error Reason|\n")
+        f.write("|--- | --- | ---|\n")
+    open("log.json", "w").close()
+    # data/ckan/ is kept: ckan.py only fetches packages modified since the last run
+    for folder in ["arcgis", "dcat", "scraped-results", "USMART"]:
+        for fname in glob.glob(os.path.join("data", folder, "*")):
+            if os.path.isfile(fname):
+                os.remove(fname)
+    for fname in ["data/merged_output.csv", "data/merged_output.parquet"]:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+
+def run_stage(stage, processor_args):
+    args = [sys.executable, stage.script]
+    if stage.processor:
+        args += processor_args
+    start = time.perf_counter()
+    result = subprocess.run(
+        args,
+        cwd=stage.cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"### {stage.name} exited with {result.returncode} in {elapsed:.1f}s")
+    print(result.stdout, flush=True)
+    return result.returncode, elapsed
+
+
+def check_stages(stages):
+    """Raises ValueError if a stage depends on a stage that doesn't exist, or on itself"""
+    deps = {stage.name: stage.after + stage.waits_for for stage in stages}
+    if len(deps) != len(stages):
+        raise ValueError("stage names must be unique")
+    for name, names in deps.items():
+        unknown = [dep for dep in names if dep not in deps]
+        if unknown:
+            raise ValueError(f"{name} depends on unknown stages: {', '.join(unknown)}")
+
+    # depth first search, a stage reached again while still being visited is a cycle
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"stages depend on each other in a cycle through {name}")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep)
+        visiting.remove(name)
+        visited.add(name)
+
+    for name in deps:
+        visit(name)
+
+
+def run(stages, workers, processor_args):
+    """Runs stages as their dependencies allow.
+
+    Returns a dict of stage name to (status, elapsed seconds), where status
+    is "ok", "failed" or "skipped". Raises ValueError if the dependencies
+    can't be met, see check_stages.
+    """
+    check_stages(stages)
+    results = {}
+    pending = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            waiting = len(pending)
+            for stage in list(pending):
+                deps = stage.after + stage.waits_for
+                if not all(dep in results for dep in deps):
+                    continue
+                pending.remove(stage)
+                if any(results[dep][0] != "ok" for dep in stage.after) or any(
+                    results[dep][0] == "skipped" for dep in stage.waits_for
+                ):
+                    print(f"### {stage.name} skipped")
+                    results[stage.name] = ("skipped", 0.0)
+                    continue
+                future = executor.submit(run_stage, stage, processor_args)
+                running[future] = stage
+            if not running:
+                if len(pending) == waiting:
+                    # can't happen after check_stages, but never spin waiting on nothing
+                    names = ", ".join(stage.name for stage in pending)
+                    raise ValueError(f"stages can never run: {names}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                returncode, elapsed = future.result()
+                results[stage.name] = ("ok" if returncode == 0 else "failed", elapsed)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the OD_BODS pipeline")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=len(FETCH_STAGES),
+        help="number of stages to run at once",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="replay source responses from the HTTP cache",
+    )
+    args = parser.parse_args(argv)
+
+    reset_outputs()
+    start = time.perf_counter()
+    results = run(STAGES, args.workers, ["--offline"] if args.offline else [])
+
+    print("| Stage | Status | Seconds |")
+    print("| --- | --- | --- |")
+    for stage in STAGES:
+        status, elapsed = results[stage.name]
+        print(f"| {stage.name} | {status} | {elapsed:.1f} |")
+    print(f"pipeline finished in {time.perf_counter() - start:.1f}s")
+
+    if any(status != "ok" for status, _ in results.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,121 @@
-import urllib.error
-from urllib import request, parse
+from urllib import parse
 from urllib.error import HTTPError, URLError
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import csv
 import json
 import os
+import sys
+import threading
+import time
+import traceback
+
+try:
+    from http_session import session
+    from records import CatalogueRecord
+    import columnar
+except:
+    from .http_session import session
+    from .records import CatalogueRecord
+    from . import columnar
+
+# Shared by every Processor so concurrent callers respect the same per-host limit
+host_semaphores = {}
+host_semaphores_lock = threading.Lock()
+
+
+class CSVSink:
+    """Streams rows into a CSV file as they are produced.
+
+    Rows are written to a temporary file next to fname, which is flushed,
+    fsynced and renamed over fname on close, so readers never see a
+    half-written file. If an exception escapes the with block the
+    temporary file is removed and any existing fname is left untouched.
+
+    With parquet, the rows are also written to a columnar.ParquetSink next
+    to fname. That copy is optional, so if it fails it is dropped with a
+    warning rather than failing the csv. With escape_unicode, descriptions
+    in the csv, but not the parquet copy, are written unicode_escape'd.
+    """
+
+    def __init__(self, fname, header, parquet=False, escape_unicode=False):
+        self.fname = fname
+        self.tmp_fname = fname + ".part"
+        self.rows = 0
+        self.committed = False
+        self.escape_unicode = escape_unicode
+        self.file = open(self.tmp_fname, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(
+            self.file, quoting=csv.QUOTE_MINIMAL, lineterminator="\n"
+        )
+        self.writer.writerow(header)
+        self.parquet = None
+        if parquet:
+            self.parquet = columnar.ParquetSink(columnar.parquet_fname(fname), header)
+
+    def writerow(self, r):
+        # rows may be shared tuples, so copy rather than edit them in place
+        escaped = r
+        if self.escape_unicode and r[-1]:
+            escaped = list(r)
+            escaped[-1] = r[-1].encode("unicode_escape").decode()
+        if r[-1] and "\n" in r[-1]:
+            r = list(r)
+            r[-1] = r[-1].replace("\n", " ")
+        if self.parquet is not None:
+            self.write_parquet(self.parquet.writerow, r)
+        self.writer.writerow(escaped if self.escape_unicode else r)
+        self.rows += 1
+
+    def writerows(self, rows):
+        for r in rows:
+            self.writerow(r)
+
+    def write_parquet(self, write, *args):
+        try:
+            write(*args)
+        except (columnar.pa.ArrowException, ValueError) as err:
+            print(f"Not writing a parquet copy of {self.fname}: {err}")
+            self.parquet.abort()
+            self.parquet = None
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_fname, self.fname)
+        self.committed = True
+        # after the csv, so the copy is never older than it
+        if self.parquet is not None:
+            self.write_parquet(self.parquet.close)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_fname)
+        if self.parquet is not None:
+            self.parquet.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
 
 
 class Processor:
     # Type should be one of the following: 'dcat', 'arcgis', 'usmart'
     def __init__(self, type):
         self.type = type
-        self.header = [
-            "Title",
-            "Owner",
-            "PageURL",
-            "AssetURL",
-            "FileName",
-            "DateCreated",
-            "DateUpdated",
-            "FileSize",
-            "FileSizeUnit",
-            "FileType",
-            "NumRecords",
-            "OriginalTags",
-            "ManualTags",
-            "License",
-            "Description",
-        ]
+        self.header = list(CatalogueRecord._fields)
         self.urls = {}
+        self.max_workers_per_host = 4
+        # also write a parquet copy of each csv, see columnar.py
+        self.parquet = columnar.available
+        # the last CSVSink opened for each output file, for process summaries
+        self.sinks = {}
 
     def get_urls(self):
         with open("sources.csv", "r", encoding="utf-8") as file:
@@ -39,30 +127,63 @@ class Processor:
                 print("r", r)
 
     def get_json(self, url):
-        req = request.Request(url)
         try:
-            return json.loads(request.urlopen(req).read().decode())
-        except HTTPError as err1:
-            print (url, "cannot be accessed. The URL returned:", err1.code, err1.reason)
+            with self.get_host_semaphore(url):
+                body = session.get(url)
+            return json.loads(body.decode())
+        except URLError as err:
+            self.log_error(url, err)
+            return "NULL"
+
+    def open_json(self, url):
+        """Opens url to be read a piece at a time, e.g. with json_stream.iter_items.
+
+        Returns "NULL" if it cannot be accessed, like get_json.
+        """
+        try:
+            return session.open(url)
+        except URLError as err:
+            self.log_error(url, err)
+            return "NULL"
+
+    def log_error(self, url, err):
+        if isinstance(err, HTTPError):
+            print (url, "cannot be accessed. The URL returned:", err.code, err.reason)
             error_dict = {
                 'url': url,
-                'error_code': err1.code,
-                'error_reason': err1.reason,
+                'error_code': err.code,
+                'error_reason': err.reason,
             }
-        except URLError as err2:
-            print(type(err2))
-            print(url, "cannot be accessed. The URL returned:", err2.reason)
+        else:
+            print(type(err))
+            print(url, "cannot be accessed. The URL returned:", err.reason)
             error_dict = {
                 'url': url,
                 'error_code': "",
-                'error_reason': str(err2.reason),
+                'error_reason': str(err.reason),
                 }
         with open('log.json', 'a') as f:
             json.dump(error_dict, f)
         with open('log.md', 'a') as file:
             file.write(f'| {error_dict["url"]} | {error_dict["error_code"]} | {error_dict["error_reason"]} | \n')
 
-        return "NULL"
+    def get_host_semaphore(self, url):
+        host = parse.urlsplit(url).netloc
+        with host_semaphores_lock:
+            if host not in host_semaphores:
+                host_semaphores[host] = threading.BoundedSemaphore(
+                    self.max_workers_per_host
+                )
+            return host_semaphores[host]
+
+    def get_json_many(self, urls):
+        """Yields get_json(url) for every url, in the order given.
+
+        Requests run concurrently, though get_json never has more than
+        max_workers_per_host in flight to any one host across all processors.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers_per_host) as executor:
+            yield from executor.map(self.get_json, urls)
 
     def get_license(self, dataset):
         try:
@@ -96,21 +217,84 @@ class Processor:
         except:
             return ""
 
+    def open_csv(self, fname, escape_unicode=False):
+        sink = CSVSink(
+            fname, self.header, parquet=self.parquet, escape_unicode=escape_unicode
+        )
+        self.sinks[fname] = sink
+        return sink
+
     def write_csv(self, fname, prepped):
-        with open(fname, "w", newline="", encoding="utf-8") as csvf:
-            w = csv.writer(csvf, quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
-            w.writerow(self.header)
-            for r in prepped:
-                if r[-1]:
-                    r[-1] = r[-1].replace("\n", " ")
-                w.writerow(r)
+        with self.open_csv(fname) as sink:
+            sink.writerows(prepped)
 
     def get_datasets(self, owner, url, fname):
         print("Override this method")
 
-    def process(self):
+    def process(self, workers=1):
+        """Fetches every source, up to workers at a time.
+
+        A source that raises is reported and skipped without stopping the
+        others. Prints rows, bytes and seconds taken for each source.
+
+        Returns:
+            int: the number of sources that failed
+        """
         self.get_urls()
 
-        for name, url in self.urls.items():
-            print(name)
-            self.get_datasets(name, url, os.path.join("data", self.type, name + ".csv"))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            summaries = list(executor.map(self.process_source, self.urls.items()))
+
+        print("| Source | Status | Rows | Bytes | Seconds |")
+        print("| --- | --- | --- | --- | --- |")
+        for name, status, rows, size, elapsed in summaries:
+            print(f"| {name} | {status} | {rows} | {size} | {elapsed:.1f} |")
+
+        stats = session.stats()
+        print(
+            f"{stats['requests']} HTTP requests: {stats['opened']} connections opened, {stats['reused']} reused, {stats['not_modified']} not modified"
+        )
+        return sum(status == "failed" for _, status, _, _, _ in summaries)
+
+    def process_source(self, source):
+        name, url = source
+        fname = os.path.join("data", self.type, name + ".csv")
+        print(name)
+        start = time.perf_counter()
+        try:
+            self.get_datasets(name, url, fname)
+            status = "ok"
+        except Exception:
+            print(f"{name} failed:")
+            traceback.print_exc()
+            status = "failed"
+        elapsed = time.perf_counter() - start
+
+        sink = self.sinks.get(fname)
+        if status == "ok" and sink and not sink.committed:
+            print(f"{name} failed: {fname} was never finished")
+            status = "failed"
+        rows = sink.rows if sink and sink.committed else 0
+        size = os.path.getsize(fname) if rows else 0
+        return name, status, rows, size, elapsed
+
+    def main(self, argv=None):
+        parser = argparse.ArgumentParser(description=f"Fetch the {self.type} sources")
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="replay responses from the HTTP cache without touching the network",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="number of sources to fetch at once",
+        )
+        args = parser.parse_args(argv)
+        session.offline = args.offline
+        failed = self.process(workers=args.workers)
+        if failed:
+            # the sources that worked are written, but let the pipeline know
+            print(f"{failed} {self.type} sources failed")
+            sys.exit(1)
@@ -0,0 +1,37 @@
+from collections import namedtuple
+from typing import NamedTuple
+
+
+class CatalogueRecord(NamedTuple):
+    """One row of a processor's output: a file, and the dataset it belongs to.
+
+    The field names are the csv header, in order.
+    """
+
+    Title: str = ""
+    Owner: str = ""
+    PageURL: str = ""
+    AssetURL: str = ""
+    FileName: str = ""
+    DateCreated: str = ""
+    DateUpdated: str = ""
+    FileSize: str = ""
+    FileSizeUnit: str = ""
+    FileType: str = ""
+    NumRecords: str = ""
+    OriginalTags: str = ""
+    ManualTags: str = ""
+    License: str = ""
+    Description: str = ""
+
+
+# merge_data.py adds these columns to the processors' records
+MERGED_FIELDS = CatalogueRecord._fields + (
+    "Source",
+    "AssetStatus",
+    "CombinedTags",
+    "ODSCategories",
+)
+
+# One row of data/merged_output.csv
+MergedRecord = namedtuple("MergedRecord", MERGED_FIELDS)
@@ -1,7 +1,8 @@
 from io import StringIO
-from urllib import request, parse
+from urllib import parse
 import pandas as pd
 from processor import Processor
+from http_session import session
 import os
 
 class ProcessorSparkQL(Processor):
@@ -40,13 +41,17 @@ class ProcessorSparkQL(Processor):
         data = parse.urlencode({"query": sparkql}).encode()
 
         # API REQUEST
-        req = request.Request("http://statistics.gov.scot/sparql", data=data)
-        req.add_header("Accept", "text/csv")
-        req.add_header("Contect-type", "application/x-www-form-urlencoded")
-        resp = request.urlopen(req)
+        resp = session.post(
+            "http://statistics.gov.scot/sparql",
+            data,
+            headers={
+                "Accept": "text/csv",
+                "Content-type": "application/x-www-form-urlencoded",
+            },
+        )
 
         # Decoding response and adding to pandas dataframe
-        respDecode = StringIO(resp.read().decode())
+        respDecode = StringIO(resp.decode())
         df = pd.read_csv(respDecode)
 
         # Dropping Duplicate Datasets by Filtering Latest Issued Dataset
@@ -81,4 +86,6 @@ class ProcessorSparkQL(Processor):
         dfOds.to_csv(fname,index=False);
 
 processor = ProcessorSparkQL()
-processor.process()
\ No newline at end of file
+
+if __name__ == "__main__":
+    processor.main()
\ No newline at end of file
@@ -37,3 +37,74 @@ def test_get_datasets(sources):
         csv_check_file = csv.reader(check_file)
         assert csv_checker(csv_check_file)
     assert filecmp.cmp(fname, expected_fname)
+
+
+class MockPagesARCGIS(ProcessorARCGIS):
+    """Serves a search for 5 datasets, 2 to a page, optionally ignoring page[number]"""
+
+    def __init__(self, honours_page_number=True):
+        super().__init__()
+        self.page_size = 2
+        self.honours_page_number = honours_page_number
+        self.requests = []
+
+    def get_json(self, url):
+        self.requests.append(url)
+        if "page[number]=" in url and self.honours_page_number:
+            number = int(url.split("page[number]=")[1].split("&")[0])
+        elif "cursor=" in url:
+            number = int(url.split("cursor=")[1])
+        else:
+            number = 1
+        ids = list(range(5))[(number - 1) * 2 : number * 2]
+        next_url = f"https://example.org/search?q=x&cursor={number + 1}"
+        return {
+            "data": [
+                {"id": f"id{n}", "attributes": {"name": f"dataset {n}"}} for n in ids
+            ],
+            "meta": {
+                "next": next_url if number < 3 else None,
+                "stats": {"count": len(ids), "totalCount": 5},
+            },
+        }
+
+
+def get_titles(mock_proc):
+    outputdir = "tests/mock_data/output/arcgis/"
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    fname = outputdir + "pages.csv"
+    mock_proc.get_datasets("test_owner", "https://example.org/search?q=x", fname)
+    with open(fname, "r", newline="", encoding="utf-8") as check_file:
+        return [row[0] for row in csv.reader(check_file)][1:]
+
+
+def test_get_datasets_fetches_pages_concurrently():
+    """test every page is requested up front from totalCount and kept in order"""
+    mock_proc = MockPagesARCGIS()
+    assert get_titles(mock_proc) == [f"dataset {n}" for n in range(5)]
+    assert len(mock_proc.requests) == 3
+    assert all("page[number]=" in url for url in mock_proc.requests)
+
+
+def test_get_datasets_follows_next_when_pages_repeat():
+    """test a hub that ignores page[number] is read through its next links instead"""
+    mock_proc = MockPagesARCGIS(honours_page_number=False)
+    assert get_titles(mock_proc) == [f"dataset {n}" for n in range(5)]
+    assert mock_proc.requests[-2:] == [
+        "https://example.org/search?q=x&cursor=2",
+        "https://example.org/search?q=x&cursor=3",
+    ]
+
+
+def test_get_datasets_raises_when_a_page_fails():
+    """test a page that can't be fetched fails the source, naming the page"""
+
+    class FailingPagesARCGIS(MockPagesARCGIS):
+        def get_json(self, url):
+            if "page[number]=3" in url:
+                return "NULL"
+            return super().get_json(url)
+
+    with pytest.raises(RuntimeError, match=r"page\[number\]=3"):
+        get_titles(FailingPagesARCGIS())
@@ -0,0 +1,83 @@
+"""Times building the csv rows for the DCAT mock feeds.
+
+Compares ProcessorDCAT.dataset_rows with the previous approach of
+deep copying a list per distribution.
+To run, from the repo root: python -m tests.benchmark_dcat
+"""
+import copy
+import glob
+import json
+import timeit
+
+try:
+    from dcat import ProcessorDCAT
+    from dates import normalise_date
+except:
+    from ..dcat import ProcessorDCAT
+    from ..dates import normalise_date
+
+
+def deepcopy_rows(e):
+    """The row building dcat.py did before dataset_rows"""
+    ds = [
+        e.get("dct:title", ""),
+        e.get("dct:publisher", "").replace(" Mapping", ""),
+        "",
+        "",
+        "",
+        "",
+        normalise_date(e.get("dct:issued", "")),
+        "",
+        "",
+        "",
+        "",
+        ";".join(e.get("dcat:keyword", [])),
+        "",
+        "",
+        e.get("dct:description", "").strip("\u200b"),
+    ]
+    pages = e.get("dcat:distribution")
+    for p in pages:
+        if p.get("dct:description", "") == "Web Page":
+            ds[2] = p.get("dcat:accessUrl", "")
+            break
+    dsl = []
+    for p in pages:
+        if p.get("dct:description", "") == "Web Page":
+            continue
+        ds[3] = p.get("dcat:accessUrl", "")
+        ds[9] = p.get("dct:title", "")
+        dsl.append(copy.deepcopy(ds))
+    if not dsl:
+        dsl.append(ds)
+    return dsl
+
+
+def main(repeat=5, number=20):
+    datasets = []
+    for fname in sorted(glob.glob("tests/mock_data/dcat/*.json")):
+        with open(fname, "r", encoding="utf-8") as f:
+            datasets += json.load(f)["dcat:dataset"]
+    processor = ProcessorDCAT()
+
+    def run(build):
+        return [row for e in datasets for row in build(e)]
+
+    old_rows = [list(row) for row in run(deepcopy_rows)]
+    new_rows = [list(row) for row in run(processor.dataset_rows)]
+    assert old_rows == new_rows, "dataset_rows doesn't match the deepcopy rows"
+    print(f"{len(datasets)} datasets, {len(new_rows)} rows, best of {repeat} x {number}")
+
+    timings = {}
+    for name, build in [
+        ("deepcopy", deepcopy_rows),
+        ("dataset_rows", processor.dataset_rows),
+    ]:
+        best = min(timeit.repeat(lambda: run(build), repeat=repeat, number=number))
+        timings[name] = best
+        print(f"{name}: {best / number * 1000:.2f}ms per pass")
+    print(f"speedup: {timings['deepcopy'] / timings['dataset_rows']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
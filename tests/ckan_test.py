@@ -0,0 +1,153 @@
+import filecmp
+import json
+import os
+from urllib import parse
+import csv
+import pytest
+from .conftest import csv_checker
+from ..ckan import ProcessorCKAN
+
+PORTAL_URL = "https://data.test.gov.uk/"
+
+
+class MockPortalCKAN(ProcessorCKAN):
+    """A ProcessorCKAN whose get_json answers from tests/mock_data/ckan
+    instead of a live CKAN portal
+    """
+
+    def __init__(self, search_enabled=True):
+        super().__init__()
+        self.page_size = 2
+        self.search_enabled = search_enabled
+        self.requests = []
+        with open("tests/mock_data/ckan/packages.json", encoding="utf-8") as f:
+            self.packages = json.load(f)
+
+    def get_json(self, url):
+        self.requests.append(url)
+        action = url.split("/api/3/action/")[1]
+        action, _, query = action.partition("?")
+        params = dict(parse.parse_qsl(query))
+        if action == "package_list":
+            return {"success": True, "result": [p["name"] for p in self.packages]}
+        if action == "package_show":
+            package = next(p for p in self.packages if p["name"] == params["id"])
+            return {"success": True, "result": package}
+        if action == "package_search" and self.search_enabled:
+            start = int(params["start"])
+            rows = int(params["rows"])
+            packages = sorted(self.packages, key=lambda p: p["name"])
+            if "fq" in params:
+                since = params["fq"].split("[")[1].split(" TO")[0].rstrip("Z")
+                packages = [p for p in packages if p["metadata_modified"] >= since]
+            if "fl" in params:
+                fields = params["fl"].split(",")
+                packages = [{f: p[f] for f in fields} for p in packages]
+            return {
+                "success": True,
+                "result": {
+                    "count": len(packages),
+                    "results": packages[start : start + rows],
+                },
+            }
+        return "NULL"
+
+
+def run_portal(test_proc, name, keep=False):
+    outputdir = "tests/mock_data/output/ckan/"
+    fname = outputdir + name + ".csv"
+    if not keep:
+        for f in (fname, test_proc.state_fname(fname)):
+            if os.path.exists(f):
+                os.remove(f)
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    test_proc.get_datasets("Test City Council", PORTAL_URL, fname)
+    return fname
+
+
+def test_get_datasets_search():
+    """test package_search pages produce valid rows in few requests"""
+    test_proc = MockPortalCKAN()
+    fname = run_portal(test_proc, "search")
+    with open(fname, "r", newline="", encoding="utf-8") as check_file:
+        rows = list(csv.reader(check_file))
+    assert csv_checker(rows)
+    assert len(rows) == 5
+    assert rows[3][2] == PORTAL_URL + "dataset/libraries"
+    assert len(test_proc.requests) == 2
+
+
+def test_get_datasets_search_matches_package_show():
+    """test the package_search and package_list/package_show paths write identical files"""
+    search_fname = run_portal(MockPortalCKAN(), "search_same")
+    show_proc = MockPortalCKAN(search_enabled=False)
+    show_fname = run_portal(show_proc, "show_same")
+    assert len(show_proc.requests) == 5
+    assert filecmp.cmp(search_fname, show_fname, shallow=False)
+
+
+def test_get_datasets_incremental():
+    """test an incremental harvest matches a full harvest of the changed portal"""
+    test_proc = MockPortalCKAN()
+    run_portal(test_proc, "incremental")
+
+    changed = test_proc.packages[0]
+    changed["title"] = "Bin Collection Days (updated)"
+    changed["metadata_modified"] = "2024-02-01T08:00:00.000000"
+    del test_proc.packages[1]
+    added = dict(changed, id="6b1a2d0e-0004", name="allotments", title="Allotments")
+    added["metadata_modified"] = "2018-01-01T00:00:00.000000"
+    test_proc.packages.append(added)
+    test_proc.requests = []
+    fname = run_portal(test_proc, "incremental", keep=True)
+
+    assert not any("package_list" in r for r in test_proc.requests)
+    with open(test_proc.state_fname(fname), encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["metadata_modified"] == "2024-02-01T08:00:00.000000"
+    assert sorted(state["packages"].values()) == [
+        "allotments",
+        "bin-collection-days",
+        "wfs-boundaries",
+    ]
+
+    test_proc.incremental = False
+    full_fname = run_portal(test_proc, "incremental_full")
+    assert filecmp.cmp(fname, full_fname, shallow=False)
+
+
+def test_get_datasets_raises_when_portal_is_unreachable():
+    """test a portal that can't be listed fails its source instead of writing nothing"""
+
+    class UnreachableCKAN(MockPortalCKAN):
+        def get_json(self, url):
+            self.requests.append(url)
+            return "NULL"
+
+    with pytest.raises(RuntimeError, match="package_list"):
+        run_portal(UnreachableCKAN(), "unreachable")
+
+
+def test_process_prunes_removed_portals(tmp_path, monkeypatch):
+    """test the outputs of a portal dropped from sources.csv are deleted before harvesting"""
+
+    class NoFetchCKAN(ProcessorCKAN):
+        def get_urls(self):
+            self.urls = {"Kept Council": PORTAL_URL}
+
+        def get_datasets(self, portal_owner, start_url, fname):
+            pass
+
+    monkeypatch.chdir(tmp_path)
+    folder = tmp_path / "data" / "ckan"
+    folder.mkdir(parents=True)
+    for name in ["Kept Council", "Gone Council"]:
+        for suffix in [".csv", ".parquet", ".state.json"]:
+            (folder / (name + suffix)).write_text("")
+    NoFetchCKAN().process()
+    assert sorted(os.listdir(folder)) == [
+        "Kept Council.csv",
+        "Kept Council.parquet",
+        "Kept Council.state.json",
+    ]
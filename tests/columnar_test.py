@@ -0,0 +1,80 @@
+"""tests columnar.py
+"""
+import os
+import time
+import pytest
+from ..processor import CSVSink
+from ..records import CatalogueRecord
+from .. import columnar
+
+pytest.importorskip("pyarrow")
+
+outputdir = "tests/mock_data/output/"
+
+
+def write_records(fname, records, **kwargs):
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    with CSVSink(fname, CatalogueRecord._fields, parquet=True, **kwargs) as sink:
+        sink.writerows(records)
+
+
+def test_parquet_copy_matches_csv():
+    """test the parquet copy reads back like the csv, with empty values as NaN"""
+    fname = outputdir + "columnar.csv"
+    write_records(
+        fname,
+        [
+            CatalogueRecord(Title="a", FileSize=12, NumRecords=None),
+            CatalogueRecord(Title="b", Description="two\nlines"),
+        ],
+    )
+    dataframe = columnar.read_frame(fname)
+    assert list(dataframe.columns) == list(CatalogueRecord._fields)
+    assert dataframe["Title"].tolist() == ["a", "b"]
+    assert dataframe["FileSize"][0] == "12"
+    assert dataframe["NumRecords"].isna().all()
+    assert dataframe["Owner"].isna().all()
+    assert dataframe["Description"][1] == "two lines"
+
+
+def test_iter_frames_reads_batches():
+    """test the parquet copy can be read a batch of rows and columns at a time"""
+    fname = outputdir + "columnar_batches.csv"
+    write_records(fname, [CatalogueRecord(Title=str(i)) for i in range(5)])
+    frames = list(columnar.iter_frames(fname, batch_size=2, columns=["Title", "Owner"]))
+    assert [len(frame) for frame in frames] == [2, 2, 1]
+    assert list(frames[0].columns) == ["Title", "Owner"]
+    assert frames[2]["Title"][0] == "4"
+    assert frames[2]["Owner"].isna().all()
+
+
+def test_escape_unicode_is_csv_only():
+    """test descriptions are only unicode_escape'd in the csv"""
+    fname = outputdir + "columnar_escaped.csv"
+    write_records(
+        fname, [CatalogueRecord(Title="a", Description="café")], escape_unicode=True
+    )
+    with open(fname, "r", encoding="utf-8") as check_file:
+        assert check_file.readlines()[1].endswith(",caf\\xe9\n")
+    assert columnar.read_frame(fname)["Description"][0] == "café"
+
+
+def test_stale_parquet_copy_is_ignored():
+    """test a parquet copy older than its csv isn't read"""
+    fname = outputdir + "columnar_stale.csv"
+    write_records(fname, [CatalogueRecord(Title="a")])
+    past = time.time() - 60
+    os.utime(columnar.parquet_fname(fname), (past, past))
+    assert columnar.read_frame(fname) is None
+
+
+def test_bad_rows_drop_the_parquet_copy():
+    """test the csv is still written when rows don't fit the parquet schema"""
+    fname = outputdir + "columnar_bad.csv"
+    if os.path.exists(columnar.parquet_fname(fname)):
+        os.remove(columnar.parquet_fname(fname))
+    write_records(fname, [["a", "b"]])
+    assert os.path.exists(fname)
+    assert not os.path.exists(columnar.parquet_fname(fname))
+    assert not os.path.exists(columnar.parquet_fname(fname) + ".part")
@@ -0,0 +1,30 @@
+"""tests dates.py
+"""
+import datetime
+import pytest
+from ..dates import normalise_date
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2020-03-23", "2020-03-23"),
+        ("2019-11-01T15:40:06.940Z", "2019-11-01"),
+        ("2022-04-14T13:25:43+05:00", "2022-04-14"),
+        ("2021-01-13 17:10:11.697000", "2021-01-13"),
+        ("13/01/2021", "2021-01-13"),
+        ("January 5, 2019", "2019-01-05"),
+        (1500000000000, "2017-07-14"),
+        (0, "1970-01-01"),
+        (datetime.date(2016, 9, 27), "2016-09-27"),
+        ("", ""),
+        ("  ", ""),
+        (None, ""),
+        (float("nan"), ""),
+        ("NULL", ""),
+        ("not a date", ""),
+        ("2021-13-45", ""),
+    ],
+)
+def test_normalise_date(value, expected):
+    assert normalise_date(value) == expected
@@ -0,0 +1,105 @@
+"""tests export2jkan.py
+"""
+import os
+import pandas as pd
+from ..export2jkan import (
+    dataset_filename,
+    export,
+    is_grouped,
+    iter_datasets,
+    iter_records,
+    load_index,
+    name_datasets,
+)
+from ..records import MERGED_FIELDS, MergedRecord
+
+
+def record(title, url, asset, **kwargs):
+    fields = dict.fromkeys(MERGED_FIELDS, "")
+    fields.update(Title=title, Owner="Owner", PageURL=url, AssetURL=asset, **kwargs)
+    return MergedRecord(**fields)
+
+
+def write_merged(tmp_path, records):
+    fname = str(tmp_path / "merged_output.csv")
+    pd.DataFrame(records, columns=MERGED_FIELDS).to_csv(fname, index=False)
+    return fname
+
+
+RECORDS = [
+    record("a", "https://a", "https://a/1.csv", FileType="CSV"),
+    record("b", "https://b", "https://b/1.json", Description="*b*"),
+    record("a", "https://a", "https://a/2.csv", FileType="CSV"),
+]
+
+
+def test_iter_datasets_groups_runs():
+    """test consecutive rows of a dataset become one Dataset"""
+    datasets = list(iter_datasets(sorted(RECORDS, key=lambda r: r.PageURL)))
+    assert [ds.title for ds in datasets] == ["a", "b"]
+    assert [f.url for f in datasets[0].files] == ["https://a/1.csv", "https://a/2.csv"]
+    assert datasets[0].files[0].show_name == "CSV"
+
+
+def test_iter_records_sorts_ungrouped_input(tmp_path):
+    """test rows that aren't grouped by dataset are sorted, keeping their order within a dataset"""
+    fname = write_merged(tmp_path, RECORDS)
+    assert not is_grouped(fname)
+    assert [r.AssetURL for r in iter_records(fname)] == [
+        "https://a/1.csv",
+        "https://a/2.csv",
+        "https://b/1.json",
+    ]
+
+
+def test_export(tmp_path):
+    """test export writes a file per dataset, and removes them once they're gone"""
+    output_dir = str(tmp_path / "_datasets")
+    cache_path = str(tmp_path / "markdown.json")
+    counts = export(write_merged(tmp_path, RECORDS), output_dir, cache_path, workers=1)
+    assert counts["added"] == 2
+    index = load_index(output_dir)
+    a, b = index["https://a"]["a"], index["https://b"]["b"]
+    assert sorted(f for f in os.listdir(output_dir) if f.endswith(".md")) == [a, b]
+    with open(os.path.join(output_dir, b), encoding="utf-8") as f:
+        assert "notes: <p><em>b</em></p>" in f.read()
+
+    fname = write_merged(tmp_path, [RECORDS[0], RECORDS[2]])
+    counts = export(fname, output_dir, cache_path, workers=1)
+    assert (counts["unchanged"], counts["removed"]) == (1, 1)
+    assert not os.path.exists(os.path.join(output_dir, b))
+    assert load_index(output_dir) == {"https://a": {"a": a}}
+
+
+def test_export_files_are_readable_by_others(tmp_path):
+    """test exported files get the umask's permissions, not a temporary file's 0600"""
+    output_dir = str(tmp_path / "_datasets")
+    umask = os.umask(0o022)
+    try:
+        export(write_merged(tmp_path, RECORDS), output_dir, str(tmp_path / "c.json"), 1)
+    finally:
+        os.umask(umask)
+    for fname in os.listdir(output_dir):
+        assert os.stat(os.path.join(output_dir, fname)).st_mode & 0o777 == 0o644
+
+
+def test_dataset_filename():
+    """test filenames are short, readable and differ for datasets with the same owner and title"""
+    datasets = list(iter_datasets([record("Café " * 100, "https://a", "")]))
+    datasets += iter_datasets([record("Café " * 100, "https://b", "")])
+    first, second = [dataset_filename(ds) for ds in datasets]
+    assert first.startswith("owner-cafe-cafe-")
+    assert len(first) <= 100
+    assert first != second
+    assert first == dataset_filename(datasets[0])
+
+
+def test_name_datasets_avoids_collisions(monkeypatch):
+    """test datasets whose short hashes match still get their own files"""
+    monkeypatch.setattr(dataset_filename, "__defaults__", (0,))
+    records = [record("a", "https://a", ""), record("a", "https://a2", "")]
+    index = {}
+    names = [fname for fname, _ in name_datasets(iter_datasets(records), index)]
+    assert names[0] == "owner-a-.md"
+    assert names[1].startswith("owner-a-") and len(names[1]) == len("owner-a-.md") + 64
+    assert index == {"https://a": {"a": names[0]}, "https://a2": {"a": names[1]}}
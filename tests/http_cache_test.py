@@ -0,0 +1,55 @@
+"""tests http_cache.py
+"""
+import os
+import time
+from ..http_cache import HTTPCache
+
+
+def make_cache(name, max_bytes=1024):
+    directory = "tests/mock_data/output/http_cache/" + name
+    if os.path.exists(directory):
+        for f in os.listdir(directory):
+            os.remove(os.path.join(directory, f))
+    return HTTPCache(directory, max_bytes=max_bytes)
+
+
+def test_store_and_load():
+    """test bodies and validators round trip through the cache"""
+    cache = make_cache("store")
+    url = "https://example.org/data.json"
+    assert cache.load(url) is None
+    assert cache.validators(url) == {}
+    cache.store(
+        url, b"{}", etag='"abc"', last_modified="Mon, 01 Aug 2022 09:30:00 GMT"
+    )
+    assert cache.load(url) == b"{}"
+    assert cache.validators(url) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Aug 2022 09:30:00 GMT",
+    }
+
+
+def test_least_recently_used_are_evicted():
+    """test the cache stays under max_bytes by dropping the oldest reads"""
+    cache = make_cache("evict", max_bytes=250)
+    for n in range(3):
+        cache.store(f"https://example.org/{n}", b"x" * 100)
+        time.sleep(0.01)
+    assert cache.load("https://example.org/0") is None
+    assert cache.load("https://example.org/1") == b"x" * 100
+    time.sleep(0.01)
+    cache.store("https://example.org/3", b"x" * 100)
+    assert cache.load("https://example.org/1") == b"x" * 100
+    assert cache.load("https://example.org/2") is None
+    assert cache.size <= 250
+
+
+def test_replacing_an_entry_keeps_the_size():
+    """test storing a url again counts only its new body"""
+    cache = make_cache("replace")
+    cache.store("https://example.org/a", b"x" * 100)
+    cache.store("https://example.org/b", b"x" * 100)
+    for _ in range(5):
+        cache.store("https://example.org/a", b"x" * 50)
+    assert cache.size == 150
+    assert cache.load("https://example.org/b") == b"x" * 100
@@ -0,0 +1,135 @@
+"""tests http_session.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+import os
+import shutil
+import threading
+import time
+import pytest
+from ..http_cache import HTTPCache
+from ..http_session import HTTPSession, TokenBucket, load_rate_limits
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small JSON body over a keep-alive connection"""
+
+    protocol_version = "HTTP/1.1"
+    flaky_failures = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/down") or (
+            self.path == "/flaky" and MockHandler.flaky_failures > 0
+        ):
+            MockHandler.flaky_failures -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(server_url):
+    """test repeated requests to one host share a single connection"""
+    session = HTTPSession()
+    for n in range(3):
+        assert session.get(f"{server_url}/{n}") == b'{"success": true}'
+    assert session.stats() == {
+        "requests": 3,
+        "opened": 1,
+        "reused": 2,
+        "not_modified": 0,
+    }
+
+
+def test_http_errors_are_raised(server_url):
+    """test error statuses surface as urllib HTTPErrors"""
+    session = HTTPSession()
+    with pytest.raises(HTTPError) as err:
+        session.get(f"{server_url}/missing")
+    assert err.value.code == 404
+
+
+def test_not_modified_served_from_cache(server_url):
+    """test a 304 is answered from the cache and offline mode never connects"""
+    cache_dir = "tests/mock_data/output/http_cache/session"
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    session = HTTPSession(cache=HTTPCache(cache_dir))
+    assert session.get(f"{server_url}/data") == b'{"success": true}'
+    assert session.get(f"{server_url}/data") == b'{"success": true}'
+    assert session.stats()["not_modified"] == 1
+
+    session.offline = True
+    assert session.get(f"{server_url}/data") == b'{"success": true}'
+    with pytest.raises(URLError):
+        session.get(f"{server_url}/never-fetched")
+    assert session.stats()["requests"] == 2
+
+
+def test_transient_errors_are_retried(server_url):
+    """test 503s are retried until the server recovers"""
+    session = HTTPSession(retries=3)
+    session.backoff = 0
+    MockHandler.flaky_failures = 2
+    assert session.get(f"{server_url}/flaky") == b'{"success": true}'
+    assert session.stats()["requests"] == 3
+
+
+def test_circuit_opens_for_failing_host(server_url):
+    """test a host that keeps failing is given up on without more requests"""
+    session = HTTPSession(retries=1)
+    session.backoff = 0
+    for n in range(5):
+        with pytest.raises(HTTPError):
+            session.get(f"{server_url}/down/{n}")
+    assert session.stats()["requests"] == 10
+    with pytest.raises(URLError):
+        session.get(f"{server_url}/data")
+    assert session.stats()["requests"] == 10
+
+
+def test_token_bucket_limits_rate():
+    """test requests beyond the burst wait for tokens to refill"""
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.monotonic()
+    for n in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
+
+
+def test_load_rate_limits():
+    """test rates are read per host from sources.csv, lowest rate winning"""
+    rate_limits = load_rate_limits("sources.csv")
+    assert rate_limits["opendata.arcgis.com"] == 2
+    assert "data.stirling.gov.uk" not in rate_limits
@@ -0,0 +1,48 @@
+"""tests json_stream.py
+"""
+import io
+import json
+import pytest
+from ..json_stream import iter_items
+
+
+class TrickleStream(io.BytesIO):
+    """A stream that hands back a few bytes per read, like a slow socket"""
+
+    def read(self, size=-1):
+        return super().read(7)
+
+
+@pytest.mark.parametrize(
+    "fname,key",
+    [
+        ("tests/mock_data/dcat/glasgow.json", "dcat:dataset"),
+        ("tests/mock_data/usmart/Cycling Scotland.json", "dataset"),
+    ],
+)
+def test_iter_items_matches_json_loads(fname, key):
+    """test items split across reads decode the same as loading the whole feed"""
+    with open(fname, "rb") as f:
+        raw = f.read()
+    assert list(iter_items(TrickleStream(raw), key)) == json.loads(raw)[key]
+
+
+@pytest.mark.parametrize(
+    "raw,expected",
+    [
+        (b'{"a": 1, "x": [1, 2.5, {"b": [3]}, "s"], "z": 12345}', [1, 2.5, {"b": [3]}, "s"]),
+        (b'{"x": []}', []),
+        (b'{"a": "x"}', []),
+        (b"{}", []),
+    ],
+)
+def test_iter_items(raw, expected):
+    """test numbers, nesting, empty arrays and missing keys"""
+    assert list(iter_items(TrickleStream(raw), "x")) == expected
+
+
+def test_iter_items_reads_to_end():
+    """test the whole stream is consumed once the items are done"""
+    stream = io.BytesIO(b'{"x": [1], "after": {"y": 2}}  ')
+    assert list(iter_items(stream, "x")) == [1]
+    assert stream.read() == b""
@@ -0,0 +1,121 @@
+"""tests merge_data.py
+"""
+import json
+import pandas as pd
+import pytest
+from ..merge_data import (
+    assign_ODScategories,
+    load_ODScategories,
+    load_sources,
+    map_unique,
+    read_source,
+    read_scotgov,
+    tidy_file_type,
+    tidy_licence,
+)
+
+
+def write_csv(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+def test_load_sources(tmp_path):
+    """test every source's files are read as strings, in order, and labelled"""
+    write_csv(tmp_path / "a" / "2.csv", ["Title,FileSize", "a2,10"])
+    write_csv(tmp_path / "a" / "1.csv", ["Title,FileSize", "a1,"])
+    write_csv(tmp_path / "a" / "sub" / "3.csv", ["Title,FileSize", "a3,1.5"])
+    (tmp_path / "a" / "1.state.json").write_text("{}")
+    write_csv(tmp_path / "scotgov.csv", ["title,date_created", "s,2022-09-02"])
+    write_csv(tmp_path / "b" / "1.csv", ["Title,FileSize", "b1,007"])
+
+    data = load_sources(
+        [
+            (str(tmp_path / "a"), "A", read_source),
+            (str(tmp_path / "scotgov.csv"), "sparql", read_scotgov),
+            (str(tmp_path / "b"), "B", read_source),
+            (str(tmp_path / "missing"), "C", read_source),
+        ]
+    )
+    assert data["Title"].tolist() == ["a1", "a2", "a3", "s", "b1"]
+    assert data["Source"].tolist() == ["A", "A", "A", "sparql", "B"]
+    assert data["FileSize"].tolist()[1:3] == ["10", "1.5"]
+    assert data["FileSize"].tolist()[4] == "007"
+    assert data["DateCreated"].tolist()[3] == "2022-09-02"
+
+
+def test_load_sources_without_files(tmp_path):
+    """test no files gives an empty table rather than an error"""
+    data = load_sources([(str(tmp_path), "A", read_source)])
+    assert len(data) == 0
+    assert "Source" in data.columns
+
+
+def test_load_ODScategories(tmp_path):
+    """test each tag maps to all of its categories, in order"""
+    fname = tmp_path / "categories.json"
+    fname.write_text(json.dumps({"Transport": ["roads", "bus"], "Planning": ["roads"]}))
+    assert load_ODScategories(str(fname)) == {
+        "roads": ("Planning", "Transport"),
+        "bus": ("Transport",),
+    }
+
+
+def test_assign_ODScategories():
+    """test categories are deduplicated and sorted, and untagged rows are Uncategorised"""
+    index = load_ODScategories()
+    combined_tags = pd.Series(
+        ["schools;roads;education", "", "not a tag", "roads;parking"],
+        index=[10, 20, 30, 40],
+    )
+    assert assign_ODScategories(combined_tags, index).tolist() == [
+        "Education;Transportation",
+        "Uncategorised",
+        "Uncategorised",
+        "Housing and Estates;Transportation",
+    ]
+
+
+def test_map_unique():
+    """test the function is called once per distinct value, missing values included"""
+    calls = []
+
+    def tidy(value):
+        calls.append(value)
+        return str(value).upper()
+
+    column = pd.Series(["a", "b", None, "a", None, "b"], dtype=object)
+    assert map_unique(column, tidy).tolist() == ["A", "B", "NAN", "A", "NAN", "B"]
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize(
+    "licence,expected",
+    [
+        ("OGL3", "Open Government Licence v3.0"),
+        (" ogl3/ ", "Open Government Licence v3.0"),
+        (
+            "https://creativecommons.org/licenses/by/4.0/",
+            "Creative Commons Attribution 4.0 International",
+        ),
+        (float("nan"), "No licence"),
+        ("My licence", "Custom licence: My licence"),
+    ],
+)
+def test_tidy_licence(licence, expected):
+    assert tidy_licence(licence) == expected
+
+
+@pytest.mark.parametrize(
+    "file_type,expected",
+    [
+        ("XLSX", "MS EXCEL"),
+        (".docx", "MS Word"),
+        ("ESRI REST", "ARCGIS GEOSERVICE"),
+        (float("nan"), "No file type"),
+        ("", "No file type"),
+        (" .csv/", "CSV"),
+    ],
+)
+def test_tidy_file_type(file_type, expected):
+    assert tidy_file_type(file_type) == expected
@@ -0,0 +1,65 @@
+"""tests pipeline.py
+"""
+import pytest
+from ..pipeline import Stage, run
+
+
+def make_script(tmp_path, name, code):
+    script = tmp_path / (name + ".py")
+    script.write_text(f"import sys\nsys.exit({code})\n")
+    return str(script)
+
+
+def test_run_follows_dependencies(tmp_path):
+    """test failures skip dependent stages but not stages that only wait"""
+    stages = [
+        Stage("fetch_ok", make_script(tmp_path, "fetch_ok", 0)),
+        Stage("fetch_broken", make_script(tmp_path, "fetch_broken", 1)),
+        Stage(
+            "merge",
+            make_script(tmp_path, "merge", 0),
+            waits_for=["fetch_ok", "fetch_broken"],
+        ),
+        Stage("export", make_script(tmp_path, "export", 0), after=["merge"]),
+        Stage("needs_broken", make_script(tmp_path, "x", 0), after=["fetch_broken"]),
+        Stage("needs_skipped", make_script(tmp_path, "y", 0), after=["needs_broken"]),
+    ]
+    results = run(stages, workers=2, processor_args=[])
+    assert {name: status for name, (status, _) in results.items()} == {
+        "fetch_ok": "ok",
+        "fetch_broken": "failed",
+        "merge": "ok",
+        "export": "ok",
+        "needs_broken": "skipped",
+        "needs_skipped": "skipped",
+    }
+
+
+def test_run_rejects_unknown_dependencies(tmp_path):
+    """test a stage depending on a missing stage fails instead of waiting forever"""
+    stages = [
+        Stage("merge", make_script(tmp_path, "merge", 0), waits_for=["fetch"]),
+    ]
+    with pytest.raises(ValueError, match="unknown stages: fetch"):
+        run(stages, workers=1, processor_args=[])
+
+
+def test_run_rejects_cycles(tmp_path):
+    """test stages that depend on each other fail instead of waiting forever"""
+    stages = [
+        Stage("a", make_script(tmp_path, "a", 0), after=["b"]),
+        Stage("b", make_script(tmp_path, "b", 0), waits_for=["a"]),
+    ]
+    with pytest.raises(ValueError, match="cycle"):
+        run(stages, workers=1, processor_args=[])
+
+
+def test_run_skips_stages_listed_before_their_dependencies(tmp_path):
+    """test a chain of skipped stages resolves whatever order the stages are listed in"""
+    stages = [
+        Stage("c", make_script(tmp_path, "c", 0), after=["b"]),
+        Stage("b", make_script(tmp_path, "b", 0), after=["a"]),
+        Stage("a", make_script(tmp_path, "a", 1)),
+    ]
+    results = run(stages, workers=1, processor_args=[])
+    assert [results[name][0] for name in "abc"] == ["failed", "skipped", "skipped"]
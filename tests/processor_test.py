@@ -1,8 +1,12 @@
 """tests processor.py
 """
 import os
+import random
+import time
 import pytest
+from ..arcgis import ProcessorARCGIS
 from ..processor import Processor
+from ..records import CatalogueRecord
 
 
 class ValidMockProcessor(Processor):
@@ -125,3 +129,135 @@ def test_get_datasets():
     url = "test_url"
     fname = "test_file"
     assert mock_processor.get_datasets(name, url, fname) == "getting data"
+
+
+def test_open_csv_replaces_file_atomically():
+    """test rows only appear in the target file once the sink is closed"""
+    mock_processor = ValidMockProcessor()
+    outputdir = "tests/mock_data/output/"
+    fname = outputdir + "mocksink.csv"
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    mock_processor.write_csv(fname, [["old"]])
+    with mock_processor.open_csv(fname) as sink:
+        sink.writerow(["a", "b", "c"])
+        sink.writerow(["1", "2", "3"])
+        with open(fname, "r", encoding="utf-8") as check_file:
+            assert len(check_file.readlines()) == 2
+    assert sink.rows == 2
+    assert not os.path.exists(fname + ".part")
+    with open(fname, "r", encoding="utf-8") as check_file:
+        assert len(check_file.readlines()) == 3
+
+
+def test_open_csv_keeps_old_file_on_error():
+    """test a failed run leaves the previous output in place"""
+    mock_processor = ValidMockProcessor()
+    outputdir = "tests/mock_data/output/"
+    fname = outputdir + "mocksink_error.csv"
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    mock_processor.write_csv(fname, [["old"]])
+    with pytest.raises(RuntimeError):
+        with mock_processor.open_csv(fname) as sink:
+            sink.writerow(["new"])
+            raise RuntimeError("portal went away")
+    assert not os.path.exists(fname + ".part")
+    with open(fname, "r", encoding="utf-8") as check_file:
+        assert check_file.readlines()[1] == "old\n"
+
+
+def test_open_csv_writes_records():
+    """test records are written in header order, without newlines in the description"""
+    mock_processor = ValidMockProcessor()
+    outputdir = "tests/mock_data/output/"
+    fname = outputdir + "mockrecords.csv"
+    if not os.path.exists(outputdir):
+        os.makedirs(outputdir)
+    record = CatalogueRecord(
+        Title="title", FileType="CSV", Description="line one\nline two"
+    )
+    with mock_processor.open_csv(fname) as sink:
+        sink.writerow(record)
+    assert record.Description == "line one\nline two"
+    with open(fname, "r", encoding="utf-8") as check_file:
+        lines = check_file.readlines()
+    assert lines[0] == ",".join(mock_processor.header) + "\n"
+    assert lines[1] == "title,,,,,,,,,CSV,,,,,line one line two\n"
+
+
+def test_get_json_many_keeps_order():
+    """test concurrent fetches come back in the order they were requested"""
+
+    class SlowMockProcessor(ValidMockProcessor):
+        def get_json(self, url):
+            time.sleep(random.random() / 100)
+            return url
+
+    mock_processor = SlowMockProcessor()
+    urls = [f"https://example.org/{n}" for n in range(20)]
+    assert list(mock_processor.get_json_many(urls)) == urls
+
+
+class FlakyMockProcessor(ValidMockProcessor):
+    """Writes a csv for test_url, and fails for broken_url"""
+
+    def get_urls(self):
+        self.urls = {"working": "test_url", "broken": "broken_url"}
+
+    def get_datasets(self, owner, url, fname):
+        if url == "broken_url":
+            raise ValueError("portal returned junk")
+        self.write_csv(fname, [["a", "b", "c"], ["1", "2", "3"]])
+
+
+def test_process_source_isolates_failures(tmp_path, monkeypatch):
+    """test a failing source is reported without stopping the others"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "test"))
+    mock_processor = FlakyMockProcessor()
+    name, status, rows, size, _ = mock_processor.process_source(("working", "test_url"))
+    assert (name, status, rows) == ("working", "ok", 2)
+    assert size == os.path.getsize(os.path.join("data", "test", "working.csv"))
+    name, status, rows, size, _ = mock_processor.process_source(
+        ("broken", "broken_url")
+    )
+    assert (name, status, rows, size) == ("broken", "failed", 0, 0)
+
+
+def test_main_exits_when_a_source_fails(tmp_path, monkeypatch):
+    """test main exits non-zero when any source failed, still writing the others"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "test"))
+    with pytest.raises(SystemExit) as exit_info:
+        FlakyMockProcessor().main([])
+    assert exit_info.value.code == 1
+    assert os.path.exists(os.path.join("data", "test", "working.csv"))
+
+
+def test_process_counts_unreachable_sources(tmp_path, monkeypatch):
+    """test a source whose feed can't be fetched counts as failed"""
+
+    class UnreachableARCGIS(ProcessorARCGIS):
+        def get_urls(self):
+            self.urls = {"unreachable": "https://example.org/search"}
+
+        def get_json(self, url):
+            return "NULL"
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "arcgis"))
+    assert UnreachableARCGIS().process() == 1
+
+
+def test_process_source_fails_unfinished_csv(tmp_path, monkeypatch):
+    """test a source whose csv was opened but never closed counts as failed"""
+
+    class UnfinishedMockProcessor(ValidMockProcessor):
+        def get_datasets(self, owner, url, fname):
+            self.open_csv(fname).writerow(CatalogueRecord(Title="a"))
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "test"))
+    _, status, rows, _, _ = UnfinishedMockProcessor().process_source(("a", "url"))
+    assert (status, rows) == ("failed", 0)
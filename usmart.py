@@ -1,7 +1,11 @@
 try:
     from processor import Processor
+    from json_stream import iter_items
+    from records import CatalogueRecord
 except:
     from .processor import Processor
+    from .json_stream import iter_items
+    from .records import CatalogueRecord
 
 
 class ProcessorUSMART(Processor):
@@ -9,14 +13,17 @@ class ProcessorUSMART(Processor):
         super().__init__(type="USMART")
 
     def get_datasets(self, owner, start_url, fname):
-        data = processor.get_json(start_url)
-        if data != "NULL":
-            datasets = data["dataset"]
-            print("Number of datasets: ", str(len(datasets)))
+        stream = self.open_json(start_url)
+        if stream == "NULL":
+            # open_json has already retried and logged the error
+            raise RuntimeError(f"could not get {start_url}")
 
-            prepped = []
+        # datasets are parsed one at a time as the catalogue downloads
+        datasets = 0
 
-            for dataset in datasets:
+        with stream, self.open_csv(fname) as sink:
+            for dataset in iter_items(stream, "dataset"):
+                datasets += 1
                 Title = dataset["title"]
                 Owner = owner
                 PageURL = dataset["landingPage"].replace(" ", "%20")
@@ -53,30 +60,27 @@ class ProcessorUSMART(Processor):
                     ManualTags.append(" ")
                 for item in filetypes:
                     print(filetypes[item][1])
-                    line = [
-                        Title,
-                        Owner,
-                        PageURL,
-                        filetypes[item][0],
-                        filetypes[item][1],  # FileName
-                        DateCreated,
-                        DateUpdated,
-                        "",
-                        "",
-                        item,
-                        "",
-                        " ".join(OriginalTags),
-                        " ".join(ManualTags),
-                        Licence,
-                        Description,
-                    ]
+                    line = CatalogueRecord(
+                        Title=Title,
+                        Owner=Owner,
+                        PageURL=PageURL,
+                        AssetURL=filetypes[item][0],
+                        FileName=filetypes[item][1],
+                        DateCreated=DateCreated,
+                        DateUpdated=DateUpdated,
+                        FileType=item,
+                        OriginalTags=" ".join(OriginalTags),
+                        ManualTags=" ".join(ManualTags),
+                        License=Licence,
+                        Description=Description,
+                    )
 
-                    prepped.append(line)
+                    sink.writerow(line)
 
-            processor.write_csv(fname, prepped)
+            print("Number of datasets: ", str(datasets))
 
 
 processor = ProcessorUSMART()
 
 if __name__ == "__main__":
-    processor.process()
+    processor.main()
@@ -1,5 +1,10 @@
-from urllib.request import Request, urlopen
 from bs4 import BeautifulSoup
+import os
+import sys
+
+# the scrapers run from web-scrapers/, so put the repo root on the path for http_session
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_session import session
 import datefinder
 import csv
 import math
@@ -177,11 +182,10 @@ def output(parsed):
 
 if __name__ == "__main__":
     ### construct array of feed objects
-    req = Request(
+    page = session.get(
         "https://www.aberdeenshire.gov.uk/data/open-data/",
         headers={"User-Agent": "Mozilla/5.0"},
     )
-    page = urlopen(req).read()
     soup = BeautifulSoup(page, "html.parser")
 
     feeds = get_feeds(soup)
@@ -1,8 +1,13 @@
 # Packages: beautifulsoup4, csv, requests, math
-import requests
 import csv
 import math
 from bs4 import BeautifulSoup
+import os
+import sys
+
+# the scrapers run from web-scrapers/, so put the repo root on the path for http_session
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_session import session
 
 # Global Variables
 URL_COUNCIL = "http://www.moray.gov.uk/"
@@ -40,8 +45,8 @@ def get_all_files():
         headers (List) : list of titles of table, list of descriptions of table, list of csv files.
     """
     url = URL_COUNCIL + URL_PAGE
-    req = requests.get(url, get_headers())
-    soup = BeautifulSoup(req.content, "html.parser")
+    req = session.get(url, headers=get_headers())
+    soup = BeautifulSoup(req, "html.parser")
     list_of_files = []
 
     list_of_titles = soup.select("td:nth-of-type(1)")
@@ -65,7 +70,9 @@ def csv_file_metadata(file_loc):
     Returns:
         number_of_records (int), total_bytes (int) : total number of records and total number of bytes of .csv files.
     """
-    text = requests.get(file_loc, get_headers()).text
+    text = session.get(file_loc, headers=get_headers()).decode(
+        "utf-8", "replace"
+    )
     lines = text.splitlines()
     data = csv.reader(lines)
     number_of_records = len(list(data)) - 1
@@ -1,11 +1,19 @@
 # Packages: beautifulsoup4, csv, requests, math
-import requests
 import csv
 import re
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+
+# the scrapers run from web-scrapers/, so put the repo root on the path for http_session
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_session import session
 
 # Global Variables
 ODR_URL = "https://data.nls.uk/"
+# pages fetched at once, the session's rate limit for data.nls.uk still applies
+MAX_WORKERS = 4
 
 
 def get_headers():
@@ -50,6 +58,18 @@ def csv_output(header, data):
             writer.writerow(record)
 
 
+def fetch_page(url: str) -> BeautifulSoup:
+    """
+    Fetches and parses a page through the shared session.
+
+    Args:
+        url (str): The URL of the page.
+    Returns:
+        BeautifulSoup object: The parsed page.
+    """
+    return BeautifulSoup(session.get(url, headers=get_headers()), "html.parser")
+
+
 def fetch_category_links():
     """
     Fetches links to data category pages from ODR_URL. It uses the dropdown menu on the 'Data' button.
@@ -57,8 +77,7 @@ def fetch_category_links():
     Returns:
         list_of_links (List): A list of URLs linking to the pages for each data category.
     """
-    initial_req = requests.get(ODR_URL, get_headers())
-    initial_soup = BeautifulSoup(initial_req.text, "html.parser")
+    initial_soup = fetch_page(ODR_URL)
     data_button = initial_soup.find("li", id="menu-item-41")
     dropdown_list = data_button.find_all("li")
 
@@ -79,8 +98,7 @@ def fetch_data_page_urls(url: str) -> list:
     Returns:
         data_page_urls (List): A list of URLs linking to the parent pages for the datasets.
     """
-    req = requests.get(url, get_headers())  # opens page for each data category
-    soup = BeautifulSoup(req.content, "html.parser")
+    soup = fetch_page(url)  # opens page for each data category
 
     data_page_urls = []
     captions = soup.select("figcaption")
@@ -318,6 +336,74 @@ def fetch_individual_descriptions(page):
     return ind_descr
 
 
+def fetch_dataset_records(url: str) -> list:
+    """
+    Fetches the page for a dataset and gets a record for each of its data files.
+
+    Args:
+        url (str): A URL linking to the parent page for the dataset.
+    Returns:
+        records (List): A list of records, one per data file.
+    """
+    print("Getting " + url)
+    soup = fetch_page(url)
+    records = []
+    list_of_asset_urls = fetch_asset_urls(soup)
+    if not list_of_asset_urls:
+        return records
+    fetched_file_size = fetch_file_size(soup)
+    fetched_num_recs = fetch_num_recs(soup)
+    counter = 0
+    nls_licence = fetch_licences(soup)
+    # print("nls_licence:", nls_licence)
+    description = fetch_description(soup)
+    indiv_descriptions = fetch_individual_descriptions(soup)[:len(list_of_asset_urls)]
+    title = fetch_title(soup)
+    # print("title:", title)
+    owner = "National Library of Scotland"
+    pageurl = url
+    # print("pageurl:", pageurl)
+    create_date = fetch_create_date(soup)
+    # print("create_date:", create_date)
+    for asseturl in list_of_asset_urls:
+        asset_url = asseturl
+        #print("asset_url:", asset_url)
+        if fetched_file_size != ["unknown"]:
+            file_size = fetched_file_size[counter][0]
+            file_unit = fetched_file_size[counter][1]
+        else:
+            file_size = "unknown"
+            file_unit = "unknown"
+
+        ### fetch_data_types is more accurate & useful, but file extension is consistent with other listings
+        data_type = asset_url.rsplit('.',1)[1] #fetch_data_types(soup)
+        # print("data_type:", data_type)
+        num_recs = fetched_num_recs[counter]
+        # print(("num_recs:", num_recs))
+        if len(indiv_descriptions) > 1:
+            description = indiv_descriptions[counter].strip(" :") + ": " + description
+
+        output = [
+            title,
+            owner,
+            pageurl,
+            asset_url,
+            create_date,
+            "NULL",
+            file_size,
+            file_unit,
+            data_type,
+            num_recs,
+            "NULL",
+            "NULL",
+            nls_licence,
+            description,
+        ]
+        records.append(output)
+        counter += 1
+    return records
+
+
 if __name__ == "__main__":
     # Record Headings
     header = [
@@ -350,64 +436,12 @@ if __name__ == "__main__":
     category_links = fetch_category_links()
 
     print("Getting data page URLs")
-    for category_link in category_links:
-        url_list = fetch_data_page_urls(category_link)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        url_lists = list(executor.map(fetch_data_page_urls, category_links))
         print("Getting data")
-        for url in url_list:
-            print("Getting " + url)
-            req = requests.get(url, get_headers())
-            soup = BeautifulSoup(req.content, "html.parser")
-            list_of_asset_urls = fetch_asset_urls(soup)
-            fetched_file_size = fetch_file_size(soup)
-            fetched_num_recs = fetch_num_recs(soup)
-            counter = 0
-            nls_licence = fetch_licences(soup)
-            # print("nls_licence:", nls_licence)
-            description = fetch_description(soup)
-            indiv_descriptions = fetch_individual_descriptions(soup)[:len(list_of_asset_urls)]
-            for asseturl in list_of_asset_urls:
-                title = fetch_title(soup)
-                # print("title:", title)
-                owner = "National Library of Scotland"
-                pageurl = url
-                # print("pageurl:", pageurl)
-                asset_url = asseturl
-                #print("asset_url:", asset_url)
-                create_date = fetch_create_date(soup)
-                # print("create_date:", create_date)
-                if fetched_file_size != ["unknown"]:
-                    file_size = fetched_file_size[counter][0]
-                    file_unit = fetched_file_size[counter][1]
-                else:
-                    file_size = "unknown"
-                    file_unit = "unknown"
-
-                ### fetch_data_types is more accurate & useful, but file extension is consistent with other listings
-                data_type = asset_url.rsplit('.',1)[1] #fetch_data_types(soup)
-                # print("data_type:", data_type)
-                num_recs = fetched_num_recs[counter]
-                # print(("num_recs:", num_recs))
-                if len(indiv_descriptions) > 1:
-                    description = indiv_descriptions[counter].strip(" :") + ": " + description
-
-                output = [
-                    title,
-                    owner,
-                    pageurl,
-                    asset_url,
-                    create_date,
-                    "NULL",
-                    file_size,
-                    file_unit,
-                    data_type,
-                    num_recs,
-                    "NULL",
-                    "NULL",
-                    nls_licence,
-                    description,
-                ]
-                data.append(output)
-                counter += 1
+        urls = [url for url_list in url_lists for url in url_list]
+        for records in executor.map(fetch_dataset_records, urls):
+            data.extend(records)
 
     print("Outputting to CSV")
     csv_output(header, data)